@@ -0,0 +1,20 @@
+"""Helpers shared by the benchmark scripts."""
+
+import time
+
+import numpy as np
+
+
+def test_signal(seconds, fs=44100):
+    """A plucked power chord, so benchmarks don't need FluidSynth."""
+    t = np.arange(int(seconds * fs)) / fs
+    envelope = np.exp(-3 * (t % 1.0))
+    chord = sum(np.sin(2 * np.pi * f * t) for f in (82.4, 123.5, 164.8))
+    return 0.3 * envelope * chord, fs
+
+
+def timed(func, *args, **kwargs):
+    """Call ``func`` and return ``(result, seconds)``."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
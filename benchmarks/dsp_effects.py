@@ -0,0 +1,56 @@
+"""Vectorized ``dsp.delay``/``dsp.chorus`` against the old per-sample loops.
+
+Run from the repository root::
+
+    python -m benchmarks.dsp_effects --seconds 60
+"""
+
+import argparse
+
+import numpy as np
+
+from guitarpedals.dsp import chorus, delay
+
+from .common import test_signal, timed
+
+
+def delay_loop(x, sr, time=0.3, feedback=0.5):
+    """The original single-echo loop, kept for comparison."""
+    delay_samples = int(sr * time)
+    out = np.zeros(len(x) + delay_samples)
+    out[: len(x)] = x
+    for i in range(len(x)):
+        out[i + delay_samples] += x[i] * feedback
+    return out[: len(x)]
+
+
+def chorus_loop(x, sr, depth_ms=15, rate=0.25):
+    """The original integer-delay chorus loop, kept for comparison."""
+    depth = int(sr * depth_ms / 1000)
+    t = np.arange(len(x))
+    mod = (depth / 2) * (1 + np.sin(2 * np.pi * rate * t / sr))
+    out = np.zeros_like(x)
+    for i in range(len(x)):
+        d = int(mod[i])
+        if i - d >= 0:
+            out[i] = (x[i] + x[i - d]) / 2
+        else:
+            out[i] = x[i]
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=60.0, help="Signal length")
+    args = parser.parse_args(argv)
+
+    x, sr = test_signal(args.seconds)
+    print(f"{'effect':<8}{'loop s':>10}{'vectorized s':>14}{'speedup':>9}")
+    for name, old, new in (("delay", delay_loop, delay), ("chorus", chorus_loop, chorus)):
+        _, loop_time = timed(old, x, sr)
+        _, fast_time = timed(new, x, sr)
+        print(f"{name:<8}{loop_time:>10.3f}{fast_time:>14.4f}{loop_time / fast_time:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Wall-time speedup of ``simulate_parallel`` over the serial path.
+
+Run from the repository root::
+
+    python -m benchmarks.parallel --seconds 20 --jobs 8
+"""
+
+import argparse
+import os
+
+from guitarpedals.cli import CIRCUITS
+from guitarpedals.parallel import simulate_parallel
+from guitarpedals.simulate import simulate_circuit
+
+from .common import test_signal, timed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=20.0, help="Clip length")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Worker processes")
+    args = parser.parse_args(argv)
+
+    audio, fs = test_signal(args.seconds)
+    print(f"{'circuit':<18}{'serial s':>10}{'parallel s':>12}{'speedup':>9}")
+    for name, factory in CIRCUITS.items():
+        _, serial = timed(simulate_circuit, factory(), audio, fs)
+        _, parallel = timed(simulate_parallel, factory, audio, fs, jobs=args.jobs)
+        print(f"{name:<18}{serial:>10.2f}{parallel:>12.2f}{serial / parallel:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Per-stage timings of the ``simulate`` pipeline for every circuit.
+
+Each configuration (circuit x clip length x oversampling factor) runs in a
+fresh process so its peak RSS can be reported on its own.  Results are
+written as JSON; ``--compare`` checks them against a saved baseline and
+exits with status 1 if any stage slowed down by more than ``--threshold``.
+
+Run from the repository root::
+
+    python -m benchmarks.pipeline --output bench.json
+    python -m benchmarks.pipeline --output new.json --compare bench.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from guitarpedals.circuits import CIRCUITS
+from guitarpedals.dsp import (
+    convolution_reverb,
+    downsample,
+    low_pass,
+    normalize,
+    oversample,
+    save_waveform_plot,
+)
+from guitarpedals.generate import generate_riff
+from guitarpedals.simulate import (
+    DEFAULT_QUALITY,
+    _attach_input,
+    _on_grid,
+    _rate_ratio,
+    _resample,
+    _run_transient,
+)
+
+from .common import test_signal
+
+STAGES = [
+    "riff",
+    "oversample",
+    "resample_in",
+    "pwl",
+    "transient",
+    "resample_back",
+    "downsample",
+    "reverb",
+    "lowpass_normalize",
+    "plot",
+]
+
+
+def _versions():
+    versions = {"python": platform.python_version()}
+    for name in ("numpy", "scipy", "PySpice", "soundfile", "matplotlib"):
+        try:
+            versions[name] = __import__(name).__version__
+        except Exception:
+            versions[name] = None
+    return versions
+
+
+def run_config(circuit_name, seconds, factor, target_fs=DEFAULT_QUALITY):
+    """Time every pipeline stage once; runs in its own process."""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stages = _run_stages(tmp, circuit_name, seconds, factor, target_fs)
+
+    return {
+        "circuit": circuit_name,
+        "seconds": seconds,
+        "oversample": factor,
+        "stages": stages,
+        "total": sum(v for v in stages.values() if v is not None),
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        / (1024**2 if sys.platform == "darwin" else 1024),
+    }
+
+
+def _run_stages(tmp, circuit_name, seconds, factor, target_fs):
+    """The stages of ``cli.main`` for ``simulate``, timed one by one."""
+
+    stages = {}
+
+    def stage(name, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        stages[name] = time.perf_counter() - start
+        return result
+
+    try:
+        audio, fs = stage(
+            "riff", generate_riff, filename=os.path.join(tmp, "riff.wav"), duration=seconds
+        )
+    except Exception:
+        # FluidSynth is optional; fall back to a synthetic clip.
+        stages["riff"] = None
+        audio, fs = test_signal(seconds)
+
+    x = stage("oversample", oversample, audio, factor)
+    rate = fs * factor
+    orig_len = len(x)
+    up, down = _rate_ratio(rate, target_fs)
+    sim_fs = rate * up / down
+    x = stage("resample_in", _resample, x, up, down)
+
+    circuit = CIRCUITS[circuit_name]()
+    times = np.arange(len(x)) / sim_fs
+    stage("pwl", _attach_input, circuit, os.path.join(tmp, "stimulus.txt"), times, x)
+
+    def transient():
+        # The same solver profile, step limit and retries as simulate_circuit.
+        analysis = _run_transient(circuit, len(x), sim_fs, target_fs)
+        return _on_grid(analysis.time, analysis.out, len(x), sim_fs)
+
+    y = stage("transient", transient)
+    y = stage("resample_back", lambda y: _resample(y, down, up)[:orig_len], y)
+    y = stage("downsample", downsample, y, factor)
+
+    rng = np.random.default_rng(0)
+    t = np.arange(int(1.5 * fs)) / fs
+    ir = rng.standard_normal(len(t)) * np.exp(-4 * t)
+    y = stage("reverb", convolution_reverb, y, ir)
+    y = stage("lowpass_normalize", lambda y: normalize(low_pass(y, fs)), y)
+    stage("plot", save_waveform_plot, y, os.path.join(tmp, "output_waveform.png"))
+    return stages
+
+
+def compare(results, baseline, threshold, min_seconds=0.005):
+    """Return ``(key, stage, before, after)`` for every regressed stage."""
+
+    def key(entry):
+        return entry["circuit"], entry["seconds"], entry["oversample"]
+
+    before = {key(entry): entry for entry in baseline["results"]}
+    regressions = []
+    for entry in results["results"]:
+        old = before.get(key(entry))
+        if old is None:
+            continue
+        for name in STAGES + ["total", "peak_rss_mb"]:
+            if name in ("total", "peak_rss_mb"):
+                a, b = old.get(name), entry.get(name)
+            else:
+                a, b = old["stages"].get(name), entry["stages"].get(name)
+            if a is None or b is None:
+                continue
+            floor = 0 if name == "peak_rss_mb" else min_seconds
+            if b > a * (1 + threshold) and b - a > floor:
+                regressions.append((key(entry), name, a, b))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--circuits", nargs="+", choices=list(CIRCUITS), default=list(CIRCUITS)
+    )
+    parser.add_argument(
+        "--lengths", nargs="+", type=float, default=[1.0, 4.0], help="Clip lengths in seconds"
+    )
+    parser.add_argument(
+        "--oversample", nargs="+", type=int, default=[1, 2], help="Oversampling factors"
+    )
+    parser.add_argument("--output", default="bench.json", help="Where to write results")
+    parser.add_argument("--compare", help="Baseline JSON to check for regressions")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="Allowed slowdown (0.2 = 20%%)"
+    )
+    args = parser.parse_args(argv)
+
+    results = {"versions": _versions(), "results": []}
+    context = multiprocessing.get_context("spawn")
+    for circuit_name in args.circuits:
+        for seconds in args.lengths:
+            for factor in args.oversample:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    entry = executor.submit(run_config, circuit_name, seconds, factor).result()
+                results["results"].append(entry)
+                print(
+                    f"{circuit_name:<18}{seconds:>6.1f}s x{factor}"
+                    f"{entry['total']:>9.2f}s{entry['peak_rss_mb']:>8.0f} MB"
+                )
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for (circuit_name, seconds, factor), name, a, b in regressions:
+            print(f"REGRESSION {circuit_name} {seconds}s x{factor} {name}: {a:.3f} -> {b:.3f}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Per-call overhead of ``simulate_circuit`` vs a warm ``SimulatorPool``.
+
+Short clips are dominated by ngspice startup and netlist parsing, which the
+pool pays only once and a batch of clips (one netlist holding a copy of the
+circuit per clip) once per batch.  Run from the repository root::
+
+    python -m benchmarks.pool --calls 20 --clip 0.05
+"""
+
+import argparse
+
+from guitarpedals.cli import CIRCUITS
+from guitarpedals.pool import SimulatorPool
+from guitarpedals.simulate import simulate_circuit
+
+from .common import test_signal, timed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20, help="Simulations per circuit")
+    parser.add_argument("--clip", type=float, default=0.05, help="Clip length in seconds")
+    args = parser.parse_args(argv)
+
+    audio, fs = test_signal(args.clip)
+    print(f"{'circuit':<18}{'cold ms/call':>14}{'warm ms/call':>14}{'batch ms/clip':>15}")
+    with SimulatorPool(size=1) as pool:
+        # Start the worker before timing anything.
+        pool.run(CIRCUITS["fuzz"](), audio, fs)
+        for name, factory in CIRCUITS.items():
+            circuit = factory()
+            _, cold = timed(
+                lambda: [simulate_circuit(circuit, audio, fs) for _ in range(args.calls)]
+            )
+            _, warm = timed(
+                lambda: [pool.run(circuit, audio, fs) for _ in range(args.calls)]
+            )
+            _, batch = timed(simulate_circuit, circuit, [audio] * args.calls, fs)
+            print(
+                f"{name:<18}{1000 * cold / args.calls:>14.1f}"
+                f"{1000 * warm / args.calls:>14.1f}"
+                f"{1000 * batch / args.calls:>15.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
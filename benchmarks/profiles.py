@@ -0,0 +1,59 @@
+"""Speed and accuracy of the ngspice solver profiles for every circuit.
+
+Each circuit is simulated with the ``draft``, ``balanced`` and
+``reference`` qualities (internal rate and solver settings together).  The
+error is the RMS difference from the ``reference`` output in dB relative to
+its level; ``retries`` counts transients that had to be repeated with
+relaxed settings.  Run from the repository root::
+
+    python -m benchmarks.profiles --clip 0.5
+"""
+
+import argparse
+
+import numpy as np
+
+from guitarpedals.cli import CIRCUITS
+from guitarpedals.profiling import profile
+from guitarpedals.simulate import SOLVER_PROFILES, simulate_circuit
+
+from .common import test_signal, timed
+
+
+def _error_db(reference, y):
+    error = np.sqrt(np.mean((reference - y) ** 2))
+    level = np.sqrt(np.mean(reference**2))
+    return 20 * np.log10(max(error, 1e-12) / level) if level else float("nan")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clip", type=float, default=0.5, help="Clip length in seconds")
+    parser.add_argument(
+        "--circuit", choices=list(CIRCUITS), action="append", help="Circuits to run (default: all)"
+    )
+    args = parser.parse_args(argv)
+
+    audio, fs = test_signal(args.clip)
+    print(
+        f"{'circuit':<18}{'profile':<11}{'seconds':>9}{'x realtime':>12}"
+        f"{'timesteps':>11}{'retries':>9}{'error dB':>10}"
+    )
+    for name in args.circuit or CIRCUITS:
+        outputs = {}
+        for quality in reversed(list(SOLVER_PROFILES)):
+            circuit = CIRCUITS[name]()
+            with profile() as profiler:
+                outputs[quality], seconds = timed(simulate_circuit, circuit, audio, fs, quality)
+            counters = profiler.metrics()["counters"]
+            error = _error_db(outputs["reference"], outputs[quality])
+            print(
+                f"{name:<18}{quality:<11}{seconds:>9.2f}{args.clip / seconds:>12.1f}"
+                f"{counters.get('ngspice_timesteps', 0):>11}"
+                f"{counters.get('convergence_retries', 0):>9}"
+                f"{'-' if quality == 'reference' else f'{error:.1f}':>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Per-request cost of ``cli simulate`` subprocesses vs the render service.
+
+Each request renders a short clip; the CLI pays interpreter start-up,
+imports and engine set-up every time, the service only the transfer and
+the simulation itself.  The service runs on localhost.  Run from the
+repository root::
+
+    python -m benchmarks.service --requests 20 --clip 0.1 --engine native
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import soundfile as sf
+
+from guitarpedals.service import render_remote, serve
+
+from .common import test_signal, timed
+
+
+def _wait_for(url, timeout=60):
+    import urllib.request
+
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            urllib.request.urlopen(f"{url}/health", timeout=1)
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("service did not start")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20, help="Requests per mode")
+    parser.add_argument("--clip", type=float, default=0.1, help="Clip length in seconds")
+    parser.add_argument("--engine", choices=["spice", "native"], default="native")
+    parser.add_argument("--workers", type=int, default=2, help="Service worker processes")
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args(argv)
+
+    audio, fs = test_signal(args.clip)
+    url = f"http://127.0.0.1:{args.port}"
+    threading.Thread(
+        target=serve,
+        args=("127.0.0.1", args.port),
+        kwargs={"workers": args.workers, "engine": args.engine},
+        daemon=True,
+    ).start()
+    _wait_for(url)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        clip = os.path.join(tmp, "clip.wav")
+        sf.write(clip, audio, fs)
+        command = [
+            sys.executable, "-m", "guitarpedals.cli", "--outdir", tmp,
+            "simulate", "--input", clip, "--engine", args.engine,
+            "--no-plots", "--no-schematic", "--no-cache",
+        ]
+        _, cli = timed(
+            lambda: [subprocess.run(command, capture_output=True, check=True) for _ in range(args.requests)]
+        )
+
+    _, serial = timed(lambda: [render_remote(audio, fs, url) for _ in range(args.requests)])
+    with ThreadPoolExecutor(args.workers) as executor:
+        _, concurrent = timed(
+            lambda: list(executor.map(lambda _: render_remote(audio, fs, url), range(args.requests)))
+        )
+
+    print(f"{'mode':<28}{'ms/request':>12}")
+    print(f"{'cli subprocess':<28}{1000 * cli / args.requests:>12.1f}")
+    print(f"{'service, one at a time':<28}{1000 * serial / args.requests:>12.1f}")
+    print(f"{'service, ' + str(args.workers) + ' concurrent':<28}{1000 * concurrent / args.requests:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
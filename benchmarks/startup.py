@@ -0,0 +1,117 @@
+"""Start-up cost of the command line interface.
+
+Measures, in fresh interpreter processes, the time to print ``--help`` and
+the time to first sample: the wall time of a ``simulate`` run on a very
+short clip with plots, schematic and the result cache disabled, so it is
+dominated by imports and engine set-up rather than by simulation.  Each
+measurement is the median of ``--repeat`` runs.  Results are written as
+JSON; ``--compare`` exits with status 1 if any of them slowed down by more
+than ``--threshold``.
+
+Run from the repository root::
+
+    python -m benchmarks.startup --output startup.json
+    python -m benchmarks.startup --output new.json --compare startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import soundfile as sf
+
+from .common import test_signal
+
+
+def _wall_time(args):
+    """Seconds taken by ``python -m guitarpedals.cli *args``, or ``None`` on failure."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-m", "guitarpedals.cli", *args], capture_output=True
+    )
+    if result.returncode != 0:
+        return None
+    return time.perf_counter() - start
+
+
+def _median(args, repeat):
+    times = [_wall_time(args) for _ in range(repeat)]
+    if None in times:
+        return None
+    return statistics.median(times)
+
+
+def measure(engines, repeat=5, seconds=0.05):
+    """Return ``{"help": s, "first_sample": {engine: s}}``."""
+    results = {"help": _median(["--help"], repeat), "first_sample": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        clip = os.path.join(tmp, "clip.wav")
+        audio, fs = test_signal(seconds)
+        sf.write(clip, audio, fs)
+        for engine in engines:
+            results["first_sample"][engine] = _median(
+                [
+                    "--outdir", tmp,
+                    "simulate", "--input", clip, "--circuit", "overdrive",
+                    "--engine", engine, "--no-plots", "--no-schematic", "--no-cache",
+                ],
+                repeat,
+            )
+    return results
+
+
+def compare(results, baseline, threshold, min_seconds=0.02):
+    """Return ``(name, before, after)`` for every regressed measurement."""
+    pairs = [("help", baseline.get("help"), results.get("help"))]
+    for engine, after in results["first_sample"].items():
+        before = baseline.get("first_sample", {}).get(engine)
+        pairs.append((f"first_sample[{engine}]", before, after))
+    return [
+        (name, a, b)
+        for name, a, b in pairs
+        if a is not None and b is not None and b > a * (1 + threshold) and b - a > min_seconds
+    ]
+
+
+def _format(seconds):
+    return "failed" if seconds is None else f"{seconds:8.3f} s"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--engines", nargs="+", choices=["spice", "lut", "native"], default=["native", "spice"]
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement")
+    parser.add_argument("--output", default="startup.json", help="Where to write results")
+    parser.add_argument("--compare", help="Baseline JSON to check for regressions")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="Allowed slowdown (0.2 = 20%%)"
+    )
+    args = parser.parse_args(argv)
+
+    results = measure(args.engines, args.repeat)
+    print(f"{'--help':<24}{_format(results['help'])}")
+    for engine, seconds in results["first_sample"].items():
+        print(f"{'first sample (' + engine + ')':<24}{_format(seconds)}")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, a, b in regressions:
+            print(f"REGRESSION {name}: {a:.3f} -> {b:.3f}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
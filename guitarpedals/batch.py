@@ -0,0 +1,178 @@
+import functools
+import glob
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+from .cache import DEFAULT_CACHE_DIR
+from .chain import default_chain, run_chain
+from .circuits import CIRCUITS
+from .simulate import DEFAULT_QUALITY
+
+
+@functools.lru_cache(maxsize=8)
+def _load(path):
+    """Load ``path`` once per worker; the same DI is reused across circuits."""
+    audio, fs = sf.read(path, dtype="float32")
+    audio.setflags(write=False)
+    return audio, fs
+
+
+@functools.lru_cache(maxsize=None)
+def _circuit(name):
+    return CIRCUITS[name]()
+
+
+def _simulate(engine, circuit, audio, fs, target_fs, cache_dir):
+    # The engines take one channel; a batch worker simulates them in turn.
+    if audio.ndim > 1:
+        return np.stack(
+            [
+                _simulate(engine, circuit, np.ascontiguousarray(column), fs, target_fs, cache_dir)
+                for column in audio.T
+            ],
+            axis=1,
+        )
+    # Engines are imported on demand so workers only load what they run.
+    if engine == "native":
+        from .native import simulate_native
+
+        return simulate_native(circuit, audio, fs)
+    if engine == "lut":
+        from .lut import simulate_lut
+
+        return simulate_lut(circuit, audio, fs, cache_dir=cache_dir)
+    from .pool import external_netlist, warm_simulator
+
+    def run(circuit, audio, fs):
+        return warm_simulator().run(external_netlist(circuit), audio, fs, target_fs)
+
+    if engine == "split":
+        from .linear import simulate_split
+
+        return simulate_split(circuit, audio, fs, run, cache_dir=cache_dir)
+    return run(circuit, audio, fs)
+
+
+def render_job(
+    input_path,
+    circuit_name,
+    output_path,
+    engine="spice",
+    factor=1,
+    target_fs=DEFAULT_QUALITY,
+    cache_dir=DEFAULT_CACHE_DIR,
+):
+    """Render one input through one circuit and write ``output_path``.
+
+    The input goes through the same :func:`~guitarpedals.chain.default_chain`
+    as the ``simulate`` command.  Runs inside a batch worker.  Returns a
+    manifest entry with the output path and per-stage timings, or the error
+    if the job failed.
+    """
+
+    entry = {"input": input_path, "circuit": circuit_name, "output": output_path}
+    timings = {}
+    start = time.perf_counter()
+    try:
+        audio, fs = _load(input_path)
+        timings["load"] = time.perf_counter() - start
+
+        def simulate(name, x, rate):
+            return _simulate(engine, _circuit(name), x, rate, target_fs, cache_dir)
+
+        stage = time.perf_counter()
+        y = run_chain(default_chain(circuit_name, factor), audio, fs, simulate, cache_dir)
+        timings["simulate"] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        sf.write(output_path, y, fs)
+        timings["write"] = time.perf_counter() - stage
+        entry["status"] = "ok"
+    except Exception as exc:
+        entry["status"] = "failed"
+        entry["error"] = f"{type(exc).__name__}: {exc}"
+        entry["traceback"] = traceback.format_exc()
+    timings["total"] = time.perf_counter() - start
+    entry["seconds"] = timings
+    return entry
+
+
+def run_batch(
+    pattern,
+    circuits,
+    outdir,
+    jobs=None,
+    engine="spice",
+    factor=1,
+    target_fs=DEFAULT_QUALITY,
+    cache_dir=DEFAULT_CACHE_DIR,
+    manifest=None,
+):
+    """Render every file matching ``pattern`` through every circuit.
+
+    Jobs run on a pool of ``jobs`` worker processes.  Each worker keeps a
+    warm ngspice simulator, the circuits it has built and the inputs it has
+    loaded, and jobs are queued circuit by circuit so a worker usually finds
+    the netlist it needs already loaded.  A JSON manifest with per-job
+    timings, output paths and failures is written to ``manifest`` (default
+    ``outdir/manifest.json``) and also returned.
+    """
+
+    inputs = sorted(glob.glob(pattern))
+    os.makedirs(outdir, exist_ok=True)
+    manifest = manifest or os.path.join(outdir, "manifest.json")
+
+    tasks = []
+    for circuit_name in circuits:
+        for input_path in inputs:
+            stem = os.path.splitext(os.path.basename(input_path))[0]
+            output_path = os.path.join(outdir, f"{stem}_{circuit_name}.wav")
+            tasks.append((input_path, circuit_name, output_path))
+
+    start = time.perf_counter()
+    entries = []
+    with ProcessPoolExecutor(
+        max_workers=jobs, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futures = [
+            executor.submit(render_job, *task, engine, factor, target_fs, cache_dir)
+            for task in tasks
+        ]
+        for task, future in zip(tasks, futures):
+            try:
+                entries.append(future.result())
+            except Exception as exc:
+                # The worker itself died (e.g. ngspice crashed the process).
+                input_path, circuit_name, output_path = task
+                entries.append(
+                    {
+                        "input": input_path,
+                        "circuit": circuit_name,
+                        "output": output_path,
+                        "status": "failed",
+                        "error": f"{type(exc).__name__}: {exc}",
+                    }
+                )
+
+    failures = [entry for entry in entries if entry["status"] != "ok"]
+    result = {
+        "pattern": pattern,
+        "circuits": list(circuits),
+        "engine": engine,
+        "oversample": factor,
+        "target_fs": target_fs,
+        "wall_seconds": time.perf_counter() - start,
+        "job_count": len(entries),
+        "failure_count": len(failures),
+        "jobs": entries,
+    }
+    with open(manifest, "w") as f:
+        json.dump(result, f, indent=2)
+    return result
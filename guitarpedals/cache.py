@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "guitarpedals")
+
+
+class ResultCache:
+    """Content-addressed disk cache for simulation outputs.
+
+    Outputs are stored as float32 ``.npy`` files named after a hash of
+    everything that determines them (see :meth:`key`) and loaded back
+    memory-mapped.  Once the files exceed ``max_bytes`` the least recently
+    used ones are deleted.  ``hits`` and ``misses`` count lookups made
+    through this instance.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=2 * 1024**3):
+        self.cache_dir = os.path.join(cache_dir, "results")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, circuit, input_wave, fs, oversample=1, **options):
+        """Hash of the netlist, input samples and shape, rate, oversampling and options."""
+        from .simulate import circuit_hash
+
+        digest = hashlib.sha256()
+        digest.update(circuit_hash(circuit).encode())
+        digest.update(np.ascontiguousarray(input_wave, dtype=np.float64).tobytes())
+        shape = list(np.shape(input_wave))
+        digest.update(json.dumps([shape, fs, oversample, options], sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key):
+        """Return the cached array for ``key`` or ``None``."""
+        path = self._path(key)
+        try:
+            out = np.load(path, mmap_mode="r")
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        # Touch the file so eviction sees it as recently used.
+        os.utime(path)
+        self.hits += 1
+        return out
+
+    def put(self, key, out):
+        path = self._path(key)
+        tmp = path + ".tmp.npy"
+        np.save(tmp, np.asarray(out, dtype=np.float32))
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until under ``max_bytes``."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npy") and ".tmp" not in name:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def simulate(self, simulate, circuit, input_wave, fs, oversample=1, **options):
+        """Return ``simulate(circuit, input_wave, fs)``, computing it only once.
+
+        ``options`` are included in the key, so pass everything besides the
+        circuit and input that changes the result (engine, target rate, ...).
+        """
+
+        key = self.key(circuit, input_wave, fs, oversample, **options)
+        out = self.get(key)
+        if out is None:
+            out = np.asarray(simulate(circuit, input_wave, fs), dtype=np.float32)
+            self.put(key, out)
+        return out
@@ -0,0 +1,222 @@
+import json
+import os
+
+import numpy as np
+
+from .cache import DEFAULT_CACHE_DIR
+from .circuits import CIRCUITS
+from .profiling import stage
+
+# Linear filters the planner can fuse into one second-order-sections cascade,
+# mapped to their ``filter_sos`` band type and parameter defaults.
+LINEAR_STAGES = {
+    "low_pass": ("low", {"cutoff": 5000}),
+    "high_pass": ("high", {"cutoff": 200}),
+    "band_pass": ("band", {"low": 200, "high": 5000}),
+}
+EFFECT_STAGES = {"delay", "chorus", "reverb", "normalize"}
+
+
+def _value(text):
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _stage(spec):
+    """Normalize a stage given as a name or a dict to ``{"type": ..., **params}``."""
+    if isinstance(spec, str):
+        spec = {"type": spec}
+    spec = dict(spec)
+    kind = spec.get("type")
+    if kind in CIRCUITS:
+        spec = {"type": "circuit", "name": kind, **{k: v for k, v in spec.items() if k != "type"}}
+    elif kind == "circuit":
+        if spec.get("name") not in CIRCUITS:
+            raise ValueError(f"Unknown circuit '{spec.get('name')}'")
+    elif kind in LINEAR_STAGES:
+        spec = {**LINEAR_STAGES[kind][1], **spec}
+    elif kind not in EFFECT_STAGES:
+        raise ValueError(f"Unknown chain stage '{kind}'")
+    if kind == "reverb" and "ir" not in spec:
+        raise ValueError("reverb stage needs an 'ir' file")
+    if spec["type"] == "circuit":
+        spec["oversample"] = int(spec.get("oversample", 1))
+    return spec
+
+
+def parse_chain(text):
+    """Parse a chain written on the command line.
+
+    Stages are separated by commas and parameters follow a colon as
+    ``key=value`` pairs separated by ``;``, e.g.
+    ``"high_pass:cutoff=80,fuzz:oversample=2,low_pass,reverb:ir=hall.wav,normalize"``.
+    """
+
+    stages = []
+    for item in text.split(","):
+        name, _, params = item.strip().partition(":")
+        spec = {"type": name}
+        for pair in filter(None, params.split(";")):
+            key, _, value = pair.partition("=")
+            spec[key.strip()] = _value(value.strip())
+        stages.append(_stage(spec))
+    return stages
+
+
+def load_chain(source):
+    """Chain from a ``.json``/``.yaml``/``.yml`` file, or a :func:`parse_chain` string.
+
+    Files hold a list of stages (names or dicts with a ``type`` key) or a
+    mapping with such a list under ``chain``; such a list may also be passed
+    directly.  YAML needs PyYAML.
+    """
+
+    if isinstance(source, (list, tuple)):
+        return [_stage(spec) for spec in source]
+    if not os.path.isfile(source):
+        return parse_chain(source)
+    with open(source) as f:
+        if source.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:  # pragma: no cover - PyYAML is optional
+                raise ValueError("reading YAML chains needs PyYAML; use JSON instead")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("chain", [])
+    return [_stage(spec) for spec in data]
+
+
+def default_chain(circuit, oversample=1, reverb_ir=None):
+    """The chain of the ``simulate`` command: circuit, reverb, low-pass, normalize."""
+    stages = [{"type": "circuit", "name": circuit, "oversample": oversample}]
+    if reverb_ir:
+        stages.append({"type": "reverb", "ir": reverb_ir})
+    stages += [{"type": "low_pass", "cutoff": 5000}, {"type": "normalize"}]
+    return stages
+
+
+def _sos(spec, sr):
+    from .dsp import filter_sos
+
+    btype, _ = LINEAR_STAGES[spec["type"]]
+    cutoff = (spec["low"], spec["high"]) if btype == "band" else spec["cutoff"]
+    return filter_sos(sr, btype, cutoff)
+
+
+def plan_chain(stages, fs):
+    """Turn ``stages`` into the list of steps :func:`run_chain` executes.
+
+    Each circuit runs at its ``oversample`` multiple of ``fs``; every other
+    stage runs at the lowest rate that needs no extra conversion, i.e. the
+    smaller of the current rate and the rate of the next circuit (``fs``
+    after the last one).  Neighbouring circuits with the same oversampling
+    therefore share one up/down conversion, and runs of adjacent linear
+    filters are fused into a single ``sosfilt`` step.  Steps are dicts with
+    an ``op`` (``resample``, ``circuit``, ``sos`` or ``effect``) and the
+    ``factor`` of ``fs`` they run at.
+    """
+
+    stages = [_stage(spec) for spec in stages]
+    steps = []
+    factor = 1
+
+    def move_to(target):
+        nonlocal factor
+        if target != factor:
+            steps.append({"op": "resample", "up": target, "down": factor, "factor": target})
+            factor = target
+
+    for i, spec in enumerate(stages):
+        if spec["type"] == "circuit":
+            move_to(spec["oversample"])
+            steps.append({"op": "circuit", "name": spec["name"], "factor": factor})
+            continue
+
+        following = [s["oversample"] for s in stages[i + 1 :] if s["type"] == "circuit"]
+        move_to(min(factor, following[0] if following else 1))
+        if spec["type"] in LINEAR_STAGES:
+            sos = _sos(spec, fs * factor)
+            previous = steps[-1] if steps else None
+            if previous and previous["op"] == "sos" and previous["factor"] == factor:
+                previous["sos"] = np.concatenate([previous["sos"], sos])
+                previous["stages"].append(spec["type"])
+            else:
+                steps.append({"op": "sos", "sos": sos, "stages": [spec["type"]], "factor": factor})
+        else:
+            steps.append({"op": "effect", "stage": spec, "factor": factor})
+    move_to(1)
+    return steps
+
+
+def describe_plan(steps, fs):
+    """One line per step of a :func:`plan_chain` result."""
+    lines = []
+    for step in steps:
+        rate = f"{fs * step['factor']:g} Hz"
+        if step["op"] == "resample":
+            lines.append(f"resample x{step['up']}/{step['down']} -> {rate}")
+        elif step["op"] == "circuit":
+            lines.append(f"circuit {step['name']} @ {rate}")
+        elif step["op"] == "sos":
+            names = " + ".join(step["stages"])
+            lines.append(f"sosfilt [{names}] ({len(step['sos'])} sections) @ {rate}")
+        else:
+            lines.append(f"{step['stage']['type']} @ {rate}")
+    return "\n".join(lines)
+
+
+def _effect(spec, x, sr, cache_dir):
+    from . import dsp
+
+    kind = spec["type"]
+    if kind == "normalize":
+        return dsp.normalize(x)
+    if kind == "delay":
+        return dsp.Delay(sr, spec.get("time", 0.3), spec.get("feedback", 0.5)).process(x)
+    if kind == "chorus":
+        return dsp.Chorus(sr, spec.get("depth_ms", 15), spec.get("rate", 0.25)).process(x)
+    from .reverb import cached_ir
+
+    return cached_ir(spec["ir"], sr, cache_dir=cache_dir).convolve(x)
+
+
+def _simulate_default(name, x, sr):
+    from .simulate import simulate_circuit
+
+    return simulate_circuit(CIRCUITS[name](), x, sr)
+
+
+def run_chain(stages, audio, fs, simulate=None, cache_dir=DEFAULT_CACHE_DIR):
+    """Apply ``stages`` to ``audio`` at rate ``fs``; returns the output at ``fs``.
+
+    ``stages`` is a list as returned by :func:`parse_chain` or
+    :func:`load_chain` and is executed as planned by :func:`plan_chain`.
+    Circuits are run by ``simulate(name, x, rate)``, by default
+    :func:`~guitarpedals.simulate.simulate_circuit`.
+    """
+
+    from .dsp import resample
+
+    simulate = simulate or _simulate_default
+    y = audio
+    for step in plan_chain(stages, fs):
+        sr = fs * step["factor"]
+        if step["op"] == "resample":
+            y = resample(y, step["up"], step["down"])
+        elif step["op"] == "circuit":
+            y = simulate(step["name"], y, sr)
+        elif step["op"] == "sos":
+            from scipy import signal
+
+            with stage("dsp.sos", samples=len(y)):
+                y = signal.sosfilt(step["sos"], y, axis=0)
+        else:
+            y = _effect(step["stage"], y, sr, cache_dir)
+    return y
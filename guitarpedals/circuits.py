@@ -1,3 +1,6 @@
+import contextlib
+import os
+
 import numpy as np
 from PySpice.Logging.Logging import setup_logging
 
@@ -8,10 +11,8 @@ from PySpice.Logging.Logging import setup_logging
 # import it explicitly here.
 from PySpice.Spice.Netlist import Circuit
 from PySpice.Unit import *
-from PySpice.Probe.Plot import plot
-from graphviz import Graph
-import schemdraw
-import schemdraw.elements as elm
+
+from .cache import DEFAULT_CACHE_DIR
 
 logger = setup_logging()
 
@@ -123,6 +124,71 @@ def tone_stack_fuzz_circuit(dc_voltage=9 @ u_V):
     return circuit
 
 
+CIRCUITS = {
+    "fuzz": fuzz_circuit,
+    "overdrive": overdrive_circuit,
+    "two_stage_fuzz": two_stage_fuzz_circuit,
+    "three_stage_fuzz": three_stage_fuzz_circuit,
+    "tone_stack_fuzz": tone_stack_fuzz_circuit,
+}
+
+# Named knobs of every circuit, mapped to the element whose value (in ohms,
+# farads or volts) they set.
+KNOBS = {
+    "fuzz": {"bias": "R2", "collector": "R3", "load": "Rload"},
+    "overdrive": {"drive": "R1", "shunt": "R2", "load": "Rload"},
+    "two_stage_fuzz": {"bias1": "R2", "bias2": "R5", "load": "Rload"},
+    "three_stage_fuzz": {
+        "bias1": "R2",
+        "bias2": "R5",
+        "bias3": "R8",
+        "load": "Rload",
+    },
+    "tone_stack_fuzz": {
+        "bias1": "R2",
+        "bias2": "R5",
+        "treble": "C1",
+        "tone": "R7",
+        "bass": "C2",
+        "load": "Rload",
+    },
+}
+
+# Attribute holding the value of each kind of element.
+_VALUE_ATTRIBUTES = {"R": "resistance", "C": "capacitance", "L": "inductance", "V": "dc_value"}
+
+
+def set_knobs(circuit, name, **values):
+    """Set the knobs ``values`` of ``circuit`` built by ``CIRCUITS[name]``.
+
+    Only component values change, so a simulator that already has the
+    circuit loaded can apply them with ``alter`` instead of reparsing it
+    (see :class:`~guitarpedals.pool.WarmSimulator`).  Returns ``circuit``.
+    """
+
+    knobs = KNOBS[name]
+    for knob, value in values.items():
+        if knob not in knobs:
+            raise ValueError(f"{name} has no knob '{knob}' (knobs: {', '.join(knobs)})")
+        element = circuit.element(knobs[knob])
+        setattr(element, _VALUE_ATTRIBUTES[element.PREFIX], float(value))
+    return circuit
+
+
+def knob_values(circuit, name):
+    """Current value of every knob of ``circuit`` as floats."""
+    values = {}
+    for knob, element_name in KNOBS[name].items():
+        element = circuit.element(element_name)
+        values[knob] = float(getattr(element, _VALUE_ATTRIBUTES[element.PREFIX]))
+    return values
+
+
+def build_circuit(name, **knobs):
+    """``CIRCUITS[name]()`` with the given knob values; see :data:`KNOBS`."""
+    return set_knobs(CIRCUITS[name](), name, **knobs)
+
+
 def save_circuit_diagram(circuit, filename):
     """Save a very simple diagram of ``circuit`` using Graphviz.
 
@@ -131,6 +197,8 @@ def save_circuit_diagram(circuit, filename):
     drawn as an edge labelled with the element name. The generated file format
     is inferred from ``filename`` (e.g. ``.png`` or ``.pdf``)."""
 
+    from graphviz import Graph
+
     graph = Graph("circuit", format=filename.split(".")[-1])
 
     for element in circuit.elements:
@@ -150,7 +218,30 @@ def save_circuit_diagram(circuit, filename):
         for start, end in zip(node_names[:-1], node_names[1:]):
             graph.edge(start, end, label=label)
 
-    graph.render(filename, cleanup=True)
+    graph.render(outfile=filename, cleanup=True)
+
+
+@contextlib.contextmanager
+def _drawing(filename):
+    """A ``schemdraw.Drawing`` saved to ``filename`` on exit.
+
+    It draws on a matplotlib :class:`~matplotlib.figure.Figure` that pyplot
+    doesn't track, so schematics can be saved from a background thread
+    without leaving open figures behind.
+    """
+
+    import schemdraw
+    from matplotlib.figure import Figure
+
+    figure = Figure()
+    axes = figure.add_subplot()
+    axes.set_aspect("equal")
+    axes.set_axis_off()
+    try:
+        with schemdraw.Drawing(canvas=axes, file=filename, show=False) as d:
+            yield d
+    finally:
+        figure.clear()
 
 
 def save_circuit_schematic(circuit, filename):
@@ -162,10 +253,12 @@ def save_circuit_schematic(circuit, filename):
     :func:`save_circuit_diagram` for any others.
     """
 
+    import schemdraw.elements as elm
+
     title = circuit.title.lower()
 
     if title == "fuzz":
-        with schemdraw.Drawing(file=filename) as d:
+        with _drawing(filename) as d:
             d.config(unit=2.0, fontsize=12)
             src = d.add(elm.SourceSin(label="Vin"))
             d.add(elm.Line().right())
@@ -188,7 +281,7 @@ def save_circuit_schematic(circuit, filename):
         return
 
     if title == "overdrive":
-        with schemdraw.Drawing(file=filename) as d:
+        with _drawing(filename) as d:
             d.config(unit=2.0, fontsize=12)
             d.add(elm.SourceSin(label="Vin"))
             d.add(elm.Line().right())
@@ -207,7 +300,7 @@ def save_circuit_schematic(circuit, filename):
         return
 
     if title == "twostagefuzz":
-        with schemdraw.Drawing(file=filename) as d:
+        with _drawing(filename) as d:
             d.config(unit=2.0, fontsize=12)
             d.add(elm.SourceSin(label="Vin"))
             d.add(elm.Line().right())
@@ -244,3 +337,33 @@ def save_circuit_schematic(circuit, filename):
 
     # Fallback to the simple graphviz representation
     save_circuit_diagram(circuit, filename)
+
+
+def cached_schematic(circuit, filename, cache_dir=DEFAULT_CACHE_DIR):
+    """:func:`save_circuit_schematic` cached on disk by netlist hash.
+
+    The image is drawn once into ``cache_dir/schematics`` and copied to
+    ``filename`` afterwards, so schemdraw and Graphviz are only imported for
+    circuits (or component values) not seen before.  With ``cache_dir=None``
+    the schematic is always drawn.
+    """
+
+    import shutil
+    import tempfile
+
+    from .simulate import circuit_hash
+
+    if not cache_dir:
+        save_circuit_schematic(circuit, filename)
+        return
+    extension = os.path.splitext(filename)[1]
+    path = os.path.join(cache_dir, "schematics", f"{circuit_hash(circuit)[:16]}{extension}")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Drawn next to the cache and moved in whole, so concurrent runs
+        # never see a partial image and failed renders leave nothing behind.
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(path)) as tmp:
+            image = os.path.join(tmp, f"schematic{extension}")
+            save_circuit_schematic(circuit, image)
+            os.replace(image, path)
+    shutil.copyfile(path, filename)
@@ -1,43 +1,111 @@
 import argparse
+import functools
+import json
 import os
-import soundfile as sf
-import librosa
-
-from .dsp import (
-    normalize,
-    low_pass,
-    oversample,
-    downsample,
-    convolution_reverb,
-    save_waveform_plot,
-)
-
-from .generate import generate_riff
-from .simulate import simulate_circuit
-from .dsp import normalize, low_pass, oversample, downsample, convolution_reverb
-from .circuits import (
-    fuzz_circuit,
-    overdrive_circuit,
-    two_stage_fuzz_circuit,
-    three_stage_fuzz_circuit,
-    tone_stack_fuzz_circuit,
-    save_circuit_schematic,
-)
-
-CIRCUITS = {
-    "fuzz": fuzz_circuit,
-    "overdrive": overdrive_circuit,
-    "two_stage_fuzz": two_stage_fuzz_circuit,
-    "three_stage_fuzz": three_stage_fuzz_circuit,
-    "tone_stack_fuzz": tone_stack_fuzz_circuit,
-}
+import sys
+
+# Only lightweight modules are imported here so ``--help`` stays fast; each
+# command imports the heavy dependencies (PySpice, SciPy, matplotlib,
+# schemdraw, pretty_midi) it actually needs.
+from .cache import DEFAULT_CACHE_DIR
+from .circuits import CIRCUITS
+from .profiling import profile, stage
 
 
 def load_audio(path):
-    data, sr = sf.read(path)
+    import soundfile as sf
+
+    data, sr = sf.read(path, dtype="float32")
     return data, sr
 
 
+def _target_fs(args):
+    """Internal simulation rate: ``--internal-rate`` if given, else ``--quality``."""
+    return args.internal_rate or args.quality
+
+
+def _add_rate_arguments(parser):
+    parser.add_argument(
+        "--quality",
+        choices=["draft", "balanced", "reference"],
+        default="balanced",
+        help="Internal simulation rate: keep 4 kHz (draft) or 8 kHz (balanced) "
+        "of bandwidth, or simulate at the input rate (reference); also picks "
+        "the ngspice tolerances, integration method and maximum step. balanced "
+        "simulates at 16 kHz, twice the timesteps of draft's 8 kHz",
+    )
+    parser.add_argument(
+        "--internal-rate",
+        type=float,
+        help="Simulate at this rate in Hz with the balanced solver settings instead "
+        "(overrides --quality)",
+    )
+
+
+def _simulate_channel(args, name, channel, fs):
+    """Simulate one channel in a worker process (circuits can't be pickled)."""
+    return _simulate(args, name, CIRCUITS[name](), channel, fs)
+
+
+def _simulate(args, name, circuit, audio, fs):
+    """Run the engine selected on the command line on the circuit ``name``."""
+    if audio.ndim > 1:
+        from .parallel import simulate_channels
+
+        return simulate_channels(functools.partial(_simulate_channel, args, name), audio, fs)
+    if args.engine == "lut":
+        from .lut import lut_error, simulate_lut
+
+        y = simulate_lut(circuit, audio, fs, cache_dir=args.cache_dir)
+        if args.check:
+            error = lut_error(circuit, audio, fs, y)
+            print(f"LUT error vs ngspice reference: {error:.1f} dB")
+        return y
+    if args.engine == "native":
+        from .native import simulate_native
+
+        return simulate_native(circuit, audio, fs)
+    if args.engine == "split":
+        from .linear import simulate_split
+        from .lut import lut_error
+        from .simulate import simulate_circuit
+
+        y = simulate_split(
+            circuit,
+            audio,
+            fs,
+            lambda c, x, rate: simulate_circuit(c, x, rate, target_fs=_target_fs(args)),
+            cache_dir=args.cache_dir,
+        )
+        if args.check:
+            error = lut_error(circuit, audio, fs, y)
+            print(f"Split error vs ngspice reference: {error:.1f} dB")
+        return y
+    if args.jobs > 1:
+        from .parallel import simulate_parallel
+        from .pool import SimulatorPool
+
+        with SimulatorPool(size=args.jobs) as pool:
+            return simulate_parallel(
+                CIRCUITS[name], audio, fs, target_fs=_target_fs(args), pool=pool
+            )
+    if args.segment:
+        import numpy as np
+
+        from .simulate import run_resampled, simulate_stream
+
+        # Segments run at the same internal rate as a whole-clip simulation.
+        def run(wave, rate):
+            segments = simulate_stream(circuit, wave, rate, args.segment, profile=_target_fs(args))
+            return np.concatenate(list(segments))
+
+        return run_resampled(run, audio, fs, _target_fs(args))
+
+    from .simulate import simulate_circuit
+
+    return simulate_circuit(circuit, audio, fs, target_fs=_target_fs(args))
+
+
 def main(argv=None):
     parser = argparse.ArgumentParser(description="Guitar pedal simulations")
     parser.add_argument(
@@ -45,6 +113,12 @@ def main(argv=None):
         default="outputs",
         help="Directory to place generated files",
     )
+    parser.add_argument(
+        "--profile",
+        choices=["text", "json", "chrome"],
+        help="Time the pipeline stages and print a breakdown (text) or write "
+        "outdir/profile.json (json) or outdir/profile_trace.json (chrome)",
+    )
     sub = parser.add_subparsers(dest="command")
 
     gen = sub.add_parser("generate", help="Generate a test riff")
@@ -52,6 +126,14 @@ def main(argv=None):
     gen.add_argument("--midi-file", help="Render this MIDI file instead of the default riff")
     gen.add_argument("--random-melody", action="store_true", help="Generate a random melody")
     gen.add_argument("--random-chords", action="store_true", help="Generate random chords")
+    gen.add_argument("--seed", type=int, help="Seed for --random-melody/--random-chords")
+    gen.add_argument(
+        "--midi-dir", help="Render every MIDI file in this directory to outdir/<name>.wav"
+    )
+    gen.add_argument("--jobs", type=int, help="Worker processes for --midi-dir (default: CPU count)")
+    gen.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory for cached renderings")
+    gen.add_argument("--no-cache", action="store_true", help="Always re-render")
+    gen.add_argument("--no-plots", action="store_true", help="Don't save a waveform plot")
 
     sim = sub.add_parser("simulate", help="Simulate a circuit on an audio file")
     sim.add_argument("--input", help="Input WAV file")
@@ -59,69 +141,443 @@ def main(argv=None):
     sim.add_argument("--duration", type=float, default=4.0, help="Length of generated riff if no input file")
     sim.add_argument("--random-melody", action="store_true", help="Generate a random melody")
     sim.add_argument("--random-chords", action="store_true", help="Generate random chords")
+    sim.add_argument("--seed", type=int, help="Seed for --random-melody/--random-chords")
     sim.add_argument("--circuit", choices=list(CIRCUITS), default="fuzz", help="Circuit to simulate")
     sim.add_argument("--output", help="Output WAV file")
     sim.add_argument("--reverb-ir", help="Impulse response WAV for convolution reverb")
     sim.add_argument("--oversample", type=int, default=1, help="Oversampling factor")
+    sim.add_argument(
+        "--chain",
+        help="Signal chain replacing --circuit/--oversample/--reverb-ir: a JSON or "
+        "YAML file, or stages like 'high_pass:cutoff=80,fuzz:oversample=2,low_pass,normalize'",
+    )
+    _add_rate_arguments(sim)
+    sim.add_argument(
+        "--segment",
+        type=float,
+        help="Simulate in segments of this many seconds to bound memory use",
+    )
+    sim.add_argument(
+        "--stream",
+        action="store_true",
+        help="Process the input file block by block so memory does not grow "
+        "with its length (no result cache or waveform plots)",
+    )
+    sim.add_argument(
+        "--block-size", type=int, default=65536, help="Frames per block with --stream"
+    )
+    sim.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of warm simulator processes for parallel simulation",
+    )
+    sim.add_argument(
+        "--engine",
+        choices=["spice", "lut", "native", "split"],
+        default="spice",
+        help="ngspice transient (reference), cached static transfer curve, "
+        "the built-in Newton solver, or ngspice for the nonlinear stages only "
+        "with the linear output section as a fitted IIR filter",
+    )
+    sim.add_argument(
+        "--check",
+        action="store_true",
+        help="With --engine lut or split, also simulate 0.5 s in ngspice at the "
+        "input rate and print the error of the fast engine against it",
+    )
+    sim.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help="Directory for cached simulation results and lookup tables",
+    )
+    sim.add_argument("--no-cache", action="store_true", help="Always re-run the simulation")
+    sim.add_argument("--no-plots", action="store_true", help="Don't save waveform plots")
+    sim.add_argument("--no-schematic", action="store_true", help="Don't save a schematic image")
+
+    batch = sub.add_parser("batch", help="Render many input files through many circuits")
+    batch.add_argument("inputs", help="Glob of input WAV files, e.g. 'dis/*.wav'")
+    batch.add_argument(
+        "--circuits",
+        nargs="+",
+        choices=list(CIRCUITS),
+        default=list(CIRCUITS),
+        help="Circuits to apply to every input (default: all)",
+    )
+    batch.add_argument("--jobs", type=int, help="Worker processes (default: CPU count)")
+    batch.add_argument("--engine", choices=["spice", "lut", "native", "split"], default="spice")
+    batch.add_argument("--oversample", type=int, default=1, help="Oversampling factor")
+    _add_rate_arguments(batch)
+    batch.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory for lookup tables")
+    batch.add_argument("--manifest", help="JSON manifest path (default: outdir/manifest.json)")
+
+    sweep = sub.add_parser("sweep", help="Simulate a circuit over a grid of knob settings")
+    sweep.add_argument("--circuit", choices=list(CIRCUITS), default="fuzz", help="Circuit to sweep")
+    sweep.add_argument(
+        "--knob",
+        action="append",
+        default=[],
+        metavar="NAME=V1,V2,...",
+        help="Values of one knob, e.g. bias=47k,100k,220k (repeat for a grid)",
+    )
+    sweep.add_argument("--input", help="Input WAV file (default: a test tone)")
+    sweep.add_argument("--duration", type=float, default=0.5, help="Length of the test tone")
+    sweep.add_argument("--frequency", type=float, default=220.0, help="Test tone frequency in Hz")
+    sweep.add_argument("--amplitude", type=float, default=0.5, help="Test tone amplitude")
+    sweep.add_argument("--jobs", type=int, help="Worker processes (default: CPU count)")
+    sweep.add_argument("--engine", choices=["spice", "native"], default="spice")
+    _add_rate_arguments(sweep)
+    sweep.add_argument("--output", help="CSV table (default: outdir/sweep_<circuit>.csv)")
+
+    live = sub.add_parser(
+        "live", help="Play a WAV file through a pedal in real-time-sized blocks"
+    )
+    live.add_argument("--input", required=True, help="Input WAV file")
+    live.add_argument("--circuit", choices=list(CIRCUITS), default="fuzz", help="Circuit to play through")
+    live.add_argument("--chain", help="Signal chain instead of --circuit (see simulate --chain)")
+    live.add_argument("--block-size", type=int, default=256, help="Samples per block (64-1024)")
+    live.add_argument(
+        "--realtime",
+        action="store_true",
+        help="Wait for each block as a sound card would instead of running flat out",
+    )
+    live.add_argument("--output", help="Write the processed audio to this WAV file")
+    live.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory for reverb IR spectra")
+
+    serve = sub.add_parser("serve", help="Run a local render service with warm workers")
+    serve.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    serve.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    serve.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    serve.add_argument(
+        "--engine", choices=["spice", "lut", "native", "split"], default="spice",
+        help="Default engine for jobs that don't choose one",
+    )
+    _add_rate_arguments(serve)
+    serve.add_argument("--max-queue", type=int, default=64, help="Jobs allowed to wait for a worker")
+    serve.add_argument(
+        "--ir-dir",
+        help="Directory of impulse responses that reverb stages may name (default: reverb disabled)",
+    )
+    serve.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory for lookup tables and IR spectra")
 
     args = parser.parse_args(argv)
+    os.makedirs(args.outdir, exist_ok=True)
+
+    if not args.profile:
+        _run(parser, args)
+        return
+
+    with profile() as profiler:
+        _run(parser, args)
+    if args.profile == "text":
+        print(profiler.report())
+    elif args.profile == "json":
+        with open(os.path.join(args.outdir, "profile.json"), "w") as f:
+            json.dump(profiler.metrics(), f, indent=2)
+    else:
+        with open(os.path.join(args.outdir, "profile_trace.json"), "w") as f:
+            json.dump(profiler.chrome_trace(), f)
+
+
+def _generate(args):
+    from .generate import generate_riff, render_midi_folder
+
+    cache_dir = None if args.no_cache else args.cache_dir
+    if args.midi_dir:
+        outputs = render_midi_folder(args.midi_dir, args.outdir, jobs=args.jobs, cache_dir=cache_dir)
+        print(f"Rendered {len(outputs)} MIDI files to {args.outdir}")
+        return
+
+    audio, _ = generate_riff(
+        filename=os.path.join(args.outdir, "riff.wav"),
+        midi_file=args.midi_file,
+        duration=args.duration,
+        random_melody=args.random_melody,
+        random_chords=args.random_chords,
+        seed=args.seed,
+        cache_dir=cache_dir,
+    )
+    if not args.no_plots:
+        from .dsp import save_waveform_plot
+
+        save_waveform_plot(audio, os.path.join(args.outdir, "riff_waveform.png"), "Generated Riff")
+
+
+def _batch(args):
+    from .batch import run_batch
+
+    result = run_batch(
+        args.inputs,
+        args.circuits,
+        args.outdir,
+        jobs=args.jobs,
+        engine=args.engine,
+        factor=args.oversample,
+        target_fs=_target_fs(args),
+        cache_dir=args.cache_dir,
+        manifest=args.manifest,
+    )
+    print(
+        f"{result['job_count']} jobs, {result['failure_count']} failed, "
+        f"{result['wall_seconds']:.1f} s"
+    )
+
+
+def _sweep(parser, args):
+    from .circuits import KNOBS
+    from .sweep import format_table, knob_grid, parse_value, run_sweep, test_tone, write_table
+
+    ranges = {}
+    for spec in args.knob:
+        name, _, values = spec.partition("=")
+        if name not in KNOBS[args.circuit]:
+            parser.error(f"{args.circuit} knobs are: {', '.join(KNOBS[args.circuit])}")
+        try:
+            ranges[name] = [parse_value(value) for value in values.split(",")]
+        except ValueError:
+            parser.error(f"Invalid knob values '{spec}'")
+    if not ranges:
+        parser.error(f"Give at least one --knob ({', '.join(KNOBS[args.circuit])})")
+
+    if args.input:
+        audio, fs = load_audio(args.input)
+        if audio.ndim > 1:
+            audio = audio.mean(axis=1)
+    else:
+        fs = 44100
+        audio = test_tone(fs, args.duration, args.frequency, args.amplitude)
+
+    rows = run_sweep(
+        args.circuit,
+        knob_grid(ranges),
+        audio,
+        fs,
+        jobs=args.jobs,
+        engine=args.engine,
+        target_fs=_target_fs(args),
+    )
+    print(format_table(rows))
+    write_table(rows, args.output or os.path.join(args.outdir, f"sweep_{args.circuit}.csv"))
+
+
+def _live(parser, args):
+    from .realtime import PedalProcessor, run_live
+
+    audio, fs = load_audio(args.input)
+    channels = 1 if audio.ndim == 1 else audio.shape[1]
+    try:
+        processor = PedalProcessor(
+            args.chain or args.circuit, fs, args.block_size, channels, cache_dir=args.cache_dir
+        )
+    except (ValueError, NotImplementedError) as error:
+        parser.error(str(error))
+
+    y, stats = run_live(processor, audio, realtime=args.realtime)
+    latency = stats["latency_ms"]
+    print(
+        f"{stats['blocks']} blocks of {args.block_size} samples, "
+        f"deadline {stats['deadline_ms']:.2f} ms, load {stats['load']:.0%}"
+    )
+    print(
+        f"block latency p50 {latency['p50']:.3f} ms, p90 {latency['p90']:.3f} ms, "
+        f"p99 {latency['p99']:.3f} ms, max {latency['max']:.3f} ms"
+    )
+    print(
+        f"missed deadlines: {stats['missed']}, "
+        f"added latency: {stats['latency_samples']} samples"
+    )
+    with open(os.path.join(args.outdir, "live_stats.json"), "w") as f:
+        json.dump(stats, f, indent=2)
+    if args.output:
+        import soundfile as sf
+
+        sf.write(args.output, y, fs)
+
+
+def _serve(args):
+    from .service import serve
+
+    print(f"Serving on http://{args.host}:{args.port} (Ctrl+C to stop)")
+    serve(
+        args.host,
+        args.port,
+        workers=args.workers,
+        engine=args.engine,
+        target_fs=_target_fs(args),
+        cache_dir=args.cache_dir,
+        max_queue=args.max_queue,
+        ir_dir=args.ir_dir,
+    )
+
+
+class _Artifacts:
+    """Renders schematics and plots on a background thread.
+
+    Drawing overlaps the simulation instead of delaying it; :meth:`wait`
+    blocks until everything submitted is saved and reports failures
+    without losing the rendered audio.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._jobs = []
+
+    def submit(self, path, func, *args, **kwargs):
+        from concurrent.futures import ThreadPoolExecutor
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifacts")
+        self._jobs.append((path, self._executor.submit(func, *args, **kwargs)))
+
+    def wait(self):
+        if self._executor is None:
+            return
+        with stage("plot.wait"):
+            for path, future in self._jobs:
+                try:
+                    future.result()
+                except Exception as error:
+                    print(f"Could not save {path}: {error}", file=sys.stderr)
+            self._executor.shutdown()
+
+
+def _schematic(name, path, cache_dir):
+    from .circuits import cached_schematic
+
+    # A circuit of its own: the simulation attaches and detaches its input.
+    with stage("plot.schematic"):
+        cached_schematic(CIRCUITS[name](), path, cache_dir)
+
+
+def _simulate_command(parser, args):
+    artifacts = _Artifacts()
+    try:
+        _simulate_render(parser, args, artifacts)
+    finally:
+        artifacts.wait()
+
+
+def _simulate_render(parser, args, artifacts):
+    from .cache import ResultCache
+
     outdir = args.outdir
-    os.makedirs(outdir, exist_ok=True)
+    if args.stream and args.jobs > 1:
+        parser.error("--stream cannot be combined with --jobs")
 
-    if args.command == "generate":
-        filename = os.path.join(outdir, "riff.wav")
-        audio, _ = generate_riff(
-            filename=filename,
-            midi_file=args.midi_file,
+    if args.midi or args.random_melody or args.random_chords or not args.input:
+        from .generate import generate_riff
+
+        input_path = args.input or os.path.join(outdir, "riff.wav")
+        audio, fs = generate_riff(
+            filename=input_path,
+            midi_file=args.midi,
             duration=args.duration,
             random_melody=args.random_melody,
             random_chords=args.random_chords,
+            seed=args.seed,
+            cache_dir=None if args.no_cache else args.cache_dir,
+        )
+    else:
+        input_path = args.input
+        if not os.path.exists(input_path):
+            parser.error(f"Input file '{input_path}' not found")
+        if not args.stream:
+            with stage("io.read"):
+                audio, fs = load_audio(input_path)
+
+    from .chain import default_chain, describe_plan, load_chain, plan_chain, run_chain
+
+    if args.chain:
+        if args.stream:
+            parser.error("--stream cannot be combined with --chain")
+        try:
+            stages = load_chain(args.chain)
+        except (ValueError, OSError) as error:
+            parser.error(f"Invalid --chain: {error}")
+    else:
+        stages = default_chain(args.circuit, args.oversample, args.reverb_ir)
+    names = [spec["name"] for spec in stages if spec["type"] == "circuit"]
+    circuits = {name: CIRCUITS[name]() for name in names}
+
+    if not args.no_schematic:
+        for name, circuit in circuits.items():
+            path = os.path.join(outdir, f"{circuit.title.lower()}_schematic.png")
+            artifacts.submit(path, _schematic, name, path, None if args.no_cache else args.cache_dir)
+
+    if args.stream:
+        from .streaming import simulate_file
+
+        simulate_file(
+            input_path,
+            args.output or os.path.join(outdir, "out.wav"),
+            circuits[args.circuit],
+            engine=args.engine,
+            factor=args.oversample,
+            target_fs=_target_fs(args),
+            segment_seconds=args.segment or 1.0,
+            block_size=args.block_size,
+            cache_dir=args.cache_dir,
+            reverb_ir=args.reverb_ir,
+            ir_cache_dir=None if args.no_cache else args.cache_dir,
         )
-        save_waveform_plot(audio, os.path.join(outdir, "riff_waveform.png"), "Generated Riff")
         return
 
-    if args.command == "simulate":
-        if args.midi or args.random_melody or args.random_chords or not args.input:
-            input_path = args.input or os.path.join(outdir, "riff.wav")
-            audio, fs = generate_riff(
-                filename=input_path,
-                midi_file=args.midi,
-                duration=args.duration,
-                random_melody=args.random_melody,
-                random_chords=args.random_chords,
-            )
-        else:
-            input_path = args.input
-            if not os.path.exists(input_path):
-                parser.error(f"Input file '{input_path}' not found")
-            audio, fs = load_audio(input_path)
+    if not args.no_plots:
+        from .dsp import save_waveform_plot
+
+        path = os.path.join(outdir, "input_waveform.png")
+        artifacts.submit(path, save_waveform_plot, audio, path, "Input Riff")
 
-        save_waveform_plot(audio, os.path.join(outdir, "input_waveform.png"), "Input Riff")
-        circuit = CIRCUITS[args.circuit]()
-        save_circuit_schematic(circuit, os.path.join(outdir, f"{circuit.title.lower()}_schematic.png"))
+    if args.chain:
+        print(describe_plan(plan_chain(stages, fs), fs))
 
-        if args.oversample > 1:
-            audio = oversample(audio, args.oversample)
-            fs *= args.oversample
+    cache = None if args.no_cache else ResultCache(args.cache_dir)
 
-        y = simulate_circuit(circuit, audio, fs)
+    def simulate(name, x, rate):
+        if cache is None:
+            return _simulate(args, name, circuits[name], x, rate)
+        return cache.simulate(
+            lambda c, x, rate: _simulate(args, name, c, x, rate),
+            circuits[name],
+            x,
+            rate,
+            engine=args.engine,
+            jobs=args.jobs,
+            segment=args.segment,
+            target_fs=_target_fs(args),
+        )
 
-        if args.oversample > 1:
-            y = downsample(y, args.oversample)
+    y = run_chain(stages, audio, fs, simulate, cache_dir=None if args.no_cache else args.cache_dir)
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Result cache: {stats['hits']} hits, {stats['misses']} misses")
 
-        if args.reverb_ir:
-            ir, ir_fs = load_audio(args.reverb_ir)
-            if ir_fs != fs:
-                ir = librosa.resample(ir, orig_sr=ir_fs, target_sr=fs)
-            y = convolution_reverb(y, ir)
+    import soundfile as sf
 
-        output_path = args.output or os.path.join(outdir, "out.wav")
-        y = normalize(low_pass(y, fs))
+    output_path = args.output or os.path.join(outdir, "out.wav")
+    with stage("io.write", samples=len(y)):
         sf.write(output_path, y, fs)
-        save_waveform_plot(y, os.path.join(outdir, "output_waveform.png"), f"{circuit.title} Output")
-        return
+    if not args.no_plots:
+        title = circuits[names[-1]].title if names else "Chain"
+        path = os.path.join(outdir, "output_waveform.png")
+        artifacts.submit(path, save_waveform_plot, y, path, f"{title} Output")
+
 
-    parser.print_help()
+def _run(parser, args):
+    if args.command == "generate":
+        _generate(args)
+    elif args.command == "batch":
+        _batch(args)
+    elif args.command == "simulate":
+        _simulate_command(parser, args)
+    elif args.command == "sweep":
+        _sweep(parser, args)
+    elif args.command == "live":
+        _live(parser, args)
+    elif args.command == "serve":
+        _serve(args)
+    else:
+        parser.print_help()
 
 
 if __name__ == "__main__":
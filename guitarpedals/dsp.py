@@ -1,84 +1,315 @@
 import numpy as np
 from scipy import signal
-import matplotlib.pyplot as plt
 
+from .profiling import instrument, stage
+from .reverb import DEFAULT_PARTITION, PartitionedConvolver
 
+
+@instrument("dsp.normalize")
 def normalize(x):
-    """Normalize signal to -1..1"""
+    """Normalize signal to -1..1 (one gain for all channels)"""
     max_val = np.max(np.abs(x))
     if max_val == 0:
         return x
     return x / max_val
 
 
+def filter_sos(sr, btype, cutoff):
+    """Second-order sections of the 2nd-order Butterworth filters used here.
+
+    ``cutoff`` is a frequency in Hz, or a ``(low, high)`` pair for
+    ``btype="band"``.  Sections of several filters can be stacked with
+    :func:`numpy.concatenate` and applied in one :func:`scipy.signal.sosfilt`
+    pass.
+    """
+    return signal.butter(2, np.asarray(cutoff) / (sr / 2), btype=btype, output="sos")
+
+
+@instrument("dsp.low_pass")
 def low_pass(x, sr, cutoff=5000):
-    b, a = signal.butter(2, cutoff / (sr/2), btype='low')
-    return signal.lfilter(b, a, x)
+    return signal.sosfilt(filter_sos(sr, "low", cutoff), x, axis=0)
 
 
+@instrument("dsp.high_pass")
 def high_pass(x, sr, cutoff=200):
     """Simple high-pass filter."""
-    b, a = signal.butter(2, cutoff / (sr / 2), btype="high")
-    return signal.lfilter(b, a, x)
+    return signal.sosfilt(filter_sos(sr, "high", cutoff), x, axis=0)
 
 
+@instrument("dsp.band_pass")
 def band_pass(x, sr, low, high):
     """Band-pass filter between ``low`` and ``high``."""
-    b, a = signal.butter(2, [low / (sr / 2), high / (sr / 2)], btype="band")
-    return signal.lfilter(b, a, x)
+    return signal.sosfilt(filter_sos(sr, "band", (low, high)), x, axis=0)
+
+
+@instrument("dsp.resample")
+def resample(x, up, down):
+    """Resample ``x`` by ``up / down`` using polyphase filtering."""
+    g = np.gcd(up, down)
+    if up == down:
+        return x
+    return signal.resample_poly(x, up // g, down // g, axis=0)
 
 
+@instrument("dsp.oversample")
 def oversample(x, factor=2):
     """Upsample ``x`` by ``factor`` using polyphase filtering."""
     if factor <= 1:
         return x
-    return signal.resample_poly(x, factor, 1)
+    return signal.resample_poly(x, factor, 1, axis=0)
 
 
+@instrument("dsp.downsample")
 def downsample(x, factor=2):
     """Downsample ``x`` by ``factor`` using polyphase filtering."""
     if factor <= 1:
         return x
-    return signal.resample_poly(x, 1, factor)
+    return signal.resample_poly(x, 1, factor, axis=0)
+
+
+@instrument("dsp.convolution_reverb")
+def convolution_reverb(x, ir, block_size=DEFAULT_PARTITION):
+    """Apply convolution reverb using impulse response ``ir``.
+
+    Works along axis 0 with a :class:`~guitarpedals.reverb.PartitionedConvolver`
+    and keeps the reverb tail, so the result has ``len(x) + len(ir) - 1``
+    samples.  A mono ``ir`` is applied to every channel of an
+    ``(n, channels)`` input; a multichannel ``ir`` is applied per channel
+    (turning a mono input into one output channel per ``ir`` channel).
+    """
+    return PartitionedConvolver.from_ir(ir, block_size).convolve(x)
+
+
+class SOSFilter:
+    """Second-order sections ``sos`` applied block by block, keeping filter state."""
+
+    def __init__(self, sos):
+        self.sos = sos
+        self._zi = None
+
+    def process(self, x):
+        if len(x) == 0:
+            return x
+        if self._zi is None:
+            self._zi = np.zeros((len(self.sos), 2) + np.shape(x)[1:])
+        y, self._zi = signal.sosfilt(self.sos, x, axis=0, zi=self._zi)
+        return y
+
+
+class LowPass(SOSFilter):
+    """:func:`low_pass` that keeps its filter state between :meth:`process` calls."""
+
+    def __init__(self, sr, cutoff=5000):
+        super().__init__(filter_sos(sr, "low", cutoff))
+
+
+class Resampler:
+    """Polyphase resampling by ``up / down`` fed one block at a time.
+
+    Uses the same Kaiser-windowed FIR filter as
+    :func:`scipy.signal.resample_poly`, and the concatenated output of
+    :meth:`process` and :meth:`flush` equals ``resample_poly`` applied to the
+    whole signal.  Only the input samples still needed by future outputs are
+    kept, so memory does not grow with the signal length.
+    """
+
+    def __init__(self, up, down):
+        g = np.gcd(up, down)
+        self.up, self.down = up // g, down // g
+        self._buffer = None
+        if self.up == self.down:
+            return
+        max_rate = max(self.up, self.down)
+        self._half_len = 10 * max_rate
+        h = signal.firwin(2 * self._half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0))
+        pre_pad = self.down - self._half_len % self.down
+        self._h = np.concatenate([np.zeros(pre_pad), h * self.up])
+        self._skip = (self._half_len + pre_pad) // self.down
+        self._base = 0
+        self._received = 0
+        self._produced = 0
+
+    def _compute(self, stop):
+        count = stop - self._produced
+        if count <= 0:
+            return self._buffer[:0]
+        y = signal.upfirdn(self._h, self._buffer, self.up, self.down, axis=0)
+        start = self._skip + self._produced - self._base * self.up // self.down
+        y = y[start : start + count].astype(self._buffer.dtype, copy=False)
+        self._produced = stop
+
+        # Keep from the first input the next output depends on, rounded
+        # down to a multiple of ``down`` so output indices stay whole.
+        first = -(-(stop * self.down - self._half_len) // self.up)
+        base = max(0, min(first, self._received)) // self.down * self.down
+        self._buffer = self._buffer[base - self._base :]
+        self._base = base
+        return y
+
+    def process(self, x):
+        x = np.asarray(x)
+        if self.up == self.down:
+            return x
+        if self._buffer is None:
+            self._buffer = x[:0]
+        self._buffer = np.concatenate([self._buffer, x])
+        self._received += len(x)
+        # Outputs whose filter support ends inside the received input.
+        stop = ((self._received - 1) * self.up - self._half_len) // self.down + 1
+        return self._compute(max(stop, self._produced))
+
+    def flush(self):
+        """Return the remaining output, treating the signal as ended."""
+        if self.up == self.down or self._buffer is None:
+            return np.empty(0)
+        tail = np.zeros((self._half_len // self.up + 2,) + self._buffer.shape[1:])
+        self._buffer = np.concatenate([self._buffer, tail.astype(self._buffer.dtype)])
+        return self._compute(-(-self._received * self.up // self.down))
+
+
+def resample_blocks(blocks, up, down):
+    """Yield ``blocks`` resampled by ``up / down`` with a :class:`Resampler`."""
+    resampler = Resampler(up, down)
+    for block in blocks:
+        yield resampler.process(block)
+    if up != down:
+        yield resampler.flush()
 
 
-def convolution_reverb(x, ir):
-    """Apply convolution reverb using impulse response ``ir``."""
-    y = signal.fftconvolve(x, ir, mode="full")
-    return y[: len(x)]
+class Delay:
+    """Feedback delay that keeps its state between :meth:`process` calls.
+
+    Implements the recursive comb ``y[n] = x[n] + feedback * y[n - d]``.
+    Instead of looping over samples, each block is cut into rows of ``d``
+    samples; the recursion then only runs from one row to the next, which is
+    a first-order filter along the row axis that :func:`scipy.signal.lfilter`
+    evaluates for all columns at once.  Arrays may be mono ``(n,)`` or
+    multichannel ``(n, channels)``.
+    """
+
+    def __init__(self, sr, time=0.3, feedback=0.5):
+        self.delay_samples = max(1, int(sr * time))
+        self.feedback = feedback
+        self._history = None
+
+    def process(self, x):
+        with stage("dsp.delay", samples=len(x)):
+            return self._process(x)
+
+    def _process(self, x):
+        x = np.asarray(x, dtype=float)
+        d = self.delay_samples
+        if self._history is None:
+            self._history = np.zeros((d,) + x.shape[1:])
+
+        rows = -(-len(x) // d)
+        padded = np.zeros((rows * d,) + x.shape[1:])
+        padded[: len(x)] = x
+        padded = padded.reshape((rows, d) + x.shape[1:])
+
+        zi = self.feedback * self._history[np.newaxis]
+        y, _ = signal.lfilter([1.0], [1.0, -self.feedback], padded, axis=0, zi=zi)
+        y = y.reshape((rows * d,) + x.shape[1:])[: len(x)]
+
+        self._history = np.concatenate([self._history, y])[-d:]
+        return y
+
+
+class Chorus:
+    """Chorus using a modulated, linearly interpolated delay line.
+
+    The delay for every sample of a block is computed at once and the
+    delayed signal is read with fractional-delay interpolation as a single
+    array operation.  State (the tail of the input and the LFO phase) is kept
+    between :meth:`process` calls, and multichannel ``(n, channels)`` input
+    shares one LFO across channels.
+    """
+
+    def __init__(self, sr, depth_ms=15, rate=0.25):
+        self.sr = sr
+        self.depth = int(sr * depth_ms / 1000)
+        self.rate = rate
+        self._position = 0
+        self._history = None
+
+    def process(self, x):
+        with stage("dsp.chorus", samples=len(x)):
+            return self._process(x)
+
+    def _process(self, x):
+        x = np.asarray(x, dtype=float)
+        keep = self.depth + 1
+        if self._history is None:
+            self._history = np.zeros((keep,) + x.shape[1:])
+
+        n = self._position + np.arange(len(x))
+        mod = (self.depth / 2) * (1 + np.sin(2 * np.pi * self.rate * n / self.sr))
+
+        # Read positions relative to the start of ``buffer``.
+        buffer = np.concatenate([self._history, x])
+        read = keep + np.arange(len(x)) - mod
+        i0 = np.floor(read).astype(int)
+        frac = (read - i0).reshape((-1,) + (1,) * (x.ndim - 1))
+        delayed = buffer[i0] * (1 - frac) + buffer[np.minimum(i0 + 1, len(buffer) - 1)] * frac
+
+        out = (x + delayed) / 2
+        # Before the delay line has filled there is nothing to mix in.
+        early = n - mod < 0
+        out[early] = x[early]
+
+        self._history = buffer[-keep:]
+        self._position += len(x)
+        return out
 
 
 def delay(x, sr, time=0.3, feedback=0.5):
-    """Simple feedback delay effect."""
-    delay_samples = int(sr * time)
-    out = np.zeros(len(x) + delay_samples)
-    out[: len(x)] = x
-    for i in range(len(x)):
-        out[i + delay_samples] += x[i] * feedback
-    return out[: len(x)]
+    """Feedback delay effect; see :class:`Delay`."""
+    return Delay(sr, time, feedback).process(x)
 
 
 def chorus(x, sr, depth_ms=15, rate=0.25):
-    """Basic chorus using a modulated delay line."""
-    depth = int(sr * depth_ms / 1000)
-    t = np.arange(len(x))
-    mod = (depth / 2) * (1 + np.sin(2 * np.pi * rate * t / sr))
-    out = np.zeros_like(x)
-    for i in range(len(x)):
-        d = int(mod[i])
-        if i - d >= 0:
-            out[i] = (x[i] + x[i - d]) / 2
-        else:
-            out[i] = x[i]
-    return out
-
-
-def save_waveform_plot(x, filename, title=None):
-    """Save a simple waveform plot of ``x`` to ``filename``."""
-    plt.figure(figsize=(10, 4))
-    plt.plot(x)
+    """Chorus using a modulated delay line; see :class:`Chorus`."""
+    return Chorus(sr, depth_ms, rate).process(x)
+
+
+def envelope(x, bins):
+    """Min/max envelope of ``x`` over ``bins`` equal slices.
+
+    Returns ``(position, low, high)``: the first sample index of every
+    slice and the minimum and maximum in it (per channel for an
+    ``(n, channels)`` array).  Inputs no longer than ``bins`` come back
+    unchanged as both ``low`` and ``high``.
+    """
+
+    x = np.asarray(x)
+    if len(x) <= bins:
+        return np.arange(len(x)), x, x
+    starts = np.linspace(0, len(x), bins + 1).astype(int)[:-1]
+    return starts, np.minimum.reduceat(x, starts, axis=0), np.maximum.reduceat(x, starts, axis=0)
+
+
+@instrument("plot.waveform")
+def save_waveform_plot(x, filename, title=None, figsize=(10, 4), dpi=100):
+    """Save a simple waveform plot of ``x`` to ``filename``.
+
+    Long signals are reduced to their :func:`envelope` with one slice per
+    pixel column and drawn as a vertical stroke from minimum to maximum,
+    which looks the same as plotting every sample but costs the same for a
+    riff as for an hour of audio.  Uses matplotlib's object API rather than
+    ``pyplot``, so plots can be saved from a background thread.
+    """
+
+    from matplotlib.figure import Figure
+
+    position, low, high = envelope(x, int(figsize[0] * dpi))
+    fig = Figure(figsize=figsize, dpi=dpi)
+    ax = fig.subplots()
+    if low is high:
+        ax.plot(position, low)
+    else:
+        # min, max, min, max, ... so every slice is one vertical stroke.
+        ax.plot(np.repeat(position, 2), np.stack([low, high], axis=1).reshape((-1,) + low.shape[1:]))
     if title:
-        plt.title(title)
-    plt.tight_layout()
-    plt.savefig(filename)
-    plt.close()
+        ax.set_title(title)
+    fig.tight_layout()
+    fig.savefig(filename)
@@ -1,7 +1,51 @@
-import pretty_midi
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import soundfile as sf
 
+from .cache import DEFAULT_CACHE_DIR
+from .profiling import count, stage
+
+
+def _riff_key(midi_file, instrument_name, duration, fs, random_melody, random_chords, seed):
+    """Hash identifying a rendering, or ``None`` if it can't be reproduced."""
+    digest = hashlib.sha256()
+    if midi_file:
+        with open(midi_file, "rb") as f:
+            digest.update(f.read())
+        digest.update(json.dumps(["midi", fs]).encode())
+    else:
+        mode = "chords" if random_chords else "melody" if random_melody else "riff"
+        if mode != "riff" and seed is None:
+            return None
+        digest.update(json.dumps([mode, instrument_name, duration, fs, seed]).encode())
+    return digest.hexdigest()
+
+
+def _write_riff(filename, audio, fs, key):
+    """Write ``filename`` unless it already holds the rendering ``key``.
+
+    The key is stored in the WAV's comment field so a cached riff that is
+    already on disk is not rewritten.
+    """
+    if key is not None and os.path.exists(filename):
+        try:
+            with sf.SoundFile(filename) as f:
+                if f.comment == key:
+                    return
+        except RuntimeError:
+            pass
+    with stage("riff.write", samples=len(audio)):
+        with sf.SoundFile(filename, "w", fs, 1) as f:
+            if key is not None:
+                f.comment = key
+            f.write(audio)
+
 
 def generate_riff(
     filename="riff.wav",
@@ -11,16 +55,59 @@ def generate_riff(
     fs=44100,
     random_melody=False,
     random_chords=False,
+    seed=None,
+    cache_dir=DEFAULT_CACHE_DIR,
 ):
     """Generate a guitar riff or render a provided MIDI file.
 
     The ``random_melody`` and ``random_chords`` options create simple random
-    sequences for a bit more variety when no MIDI file is supplied.
+    sequences for a bit more variety when no MIDI file is supplied; pass a
+    ``seed`` to make them reproducible.
+
+    Renderings are cached as float32 ``.npy`` files in ``cache_dir/riffs``
+    keyed by the MIDI file contents (or by the mode, instrument, duration and
+    seed of a generated riff) and the sample rate, so FluidSynth only runs
+    for new inputs.  Random riffs without a seed and ``cache_dir=None`` are
+    never cached.  Returns ``(audio, fs)`` with float32 ``audio``.
     """
 
+    key = None
+    if cache_dir:
+        key = _riff_key(
+            midi_file, instrument_name, duration, fs, random_melody, random_chords, seed
+        )
+    if key is not None:
+        path = os.path.join(cache_dir, "riffs", f"{key}.npy")
+        if os.path.exists(path):
+            count("riff_cache_hits")
+            audio = np.load(path, mmap_mode="r")
+            if filename:
+                _write_riff(filename, audio, fs, key)
+            return audio, fs
+
+    with stage("riff.synthesize"):
+        audio = _synthesize(
+            midi_file, instrument_name, duration, fs, random_melody, random_chords, seed
+        )
+    count("riff_samples", len(audio))
+
+    if key is not None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp.npy"
+        np.save(tmp, audio)
+        os.replace(tmp, path)
+    if filename:
+        _write_riff(filename, audio, fs, key)
+    return audio, fs
+
+
+def _synthesize(midi_file, instrument_name, duration, fs, random_melody, random_chords, seed):
+    import pretty_midi
+
     if midi_file:
         pm = pretty_midi.PrettyMIDI(midi_file)
     else:
+        rng = np.random.default_rng(seed)
         pm = pretty_midi.PrettyMIDI()
         instrument = pretty_midi.Instrument(
             program=pretty_midi.instrument_name_to_program(instrument_name)
@@ -29,7 +116,7 @@ def generate_riff(
         if random_chords:
             times = np.linspace(0, duration, 5)
             for start, end in zip(times[:-1], times[1:]):
-                root = np.random.randint(40, 55)
+                root = int(rng.integers(40, 55))
                 chord = [root, root + 4, root + 7]
                 for pitch in chord:
                     note = pretty_midi.Note(
@@ -39,7 +126,7 @@ def generate_riff(
         elif random_melody:
             times = np.linspace(0, duration, 9)
             for start, end in zip(times[:-1], times[1:]):
-                pitch = np.random.randint(40, 60)
+                pitch = int(rng.integers(40, 60))
                 note = pretty_midi.Note(
                     velocity=100, pitch=pitch, start=start, end=end
                 )
@@ -57,7 +144,39 @@ def generate_riff(
 
         pm.instruments.append(instrument)
 
-    audio = pm.fluidsynth(fs=fs)
-    if filename:
-        sf.write(filename, audio, fs)
-    return audio, fs
+    return pm.fluidsynth(fs=fs).astype(np.float32)
+
+
+def _render_midi(midi_file, filename, fs, cache_dir):
+    generate_riff(filename, midi_file=midi_file, fs=fs, cache_dir=cache_dir)
+    return filename
+
+
+def render_midi_folder(folder, outdir, jobs=None, fs=44100, cache_dir=DEFAULT_CACHE_DIR):
+    """Render every ``.mid``/``.midi`` file in ``folder`` to ``outdir/<name>.wav``.
+
+    Files are rendered on ``jobs`` worker processes (default: CPU count)
+    through :func:`generate_riff`, so unchanged files come from the cache.
+    Returns the written paths.
+    """
+
+    midi_files = sorted(
+        glob.glob(os.path.join(folder, "*.mid")) + glob.glob(os.path.join(folder, "*.midi"))
+    )
+    os.makedirs(outdir, exist_ok=True)
+    outputs = [
+        os.path.join(outdir, os.path.splitext(os.path.basename(path))[0] + ".wav")
+        for path in midi_files
+    ]
+    with ProcessPoolExecutor(
+        max_workers=jobs, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return list(
+            executor.map(
+                _render_midi,
+                midi_files,
+                outputs,
+                [fs] * len(midi_files),
+                [cache_dir] * len(midi_files),
+            )
+        )
@@ -0,0 +1,339 @@
+import hashlib
+import logging
+import os
+
+import numpy as np
+from scipy import signal
+
+from .cache import DEFAULT_CACHE_DIR
+from .profiling import stage
+
+log = logging.getLogger(__name__)
+
+# Element prefixes of linear passive components.
+LINEAR_PREFIXES = {"R", "C", "L"}
+# Frequency grid of the AC analysis the filters are fitted to.
+AC_START = 1.0
+AC_STOP = 100e3
+AC_POINTS_PER_DECADE = 20
+
+
+def _nodes(element):
+    return [str(node) for node in element.nodes]
+
+
+def linear_section(circuit):
+    """Find the linear network between a single node and ``out``.
+
+    Returns ``(node, names)``: the node where the section is driven from
+    the rest of the circuit and the names of its elements, or ``None`` when
+    ``out`` is not reached only through resistors, capacitors and inductors
+    from one such node (for example when it is a diode or transistor
+    terminal).  In ``tone_stack_fuzz_circuit`` this is the tone network
+    C1/R7/C2/R8/R9 and the load, driven from the collector ``c2``.
+    """
+
+    gnd = str(circuit.gnd)
+    fixed = {"in"}
+    for element in circuit.elements:
+        if element.PREFIX not in LINEAR_PREFIXES:
+            fixed.update(_nodes(element))
+    fixed.discard(gnd)
+    if "out" in fixed:
+        return None
+
+    linear = [e for e in circuit.elements if e.PREFIX in LINEAR_PREFIXES]
+    inside, boundary, todo = {"out"}, set(), ["out"]
+    while todo:
+        node = todo.pop()
+        for element in linear:
+            nodes = _nodes(element)
+            if node not in nodes:
+                continue
+            for other in nodes:
+                if other == gnd or other in inside:
+                    continue
+                if other in fixed:
+                    boundary.add(other)
+                else:
+                    inside.add(other)
+                    todo.append(other)
+    if len(boundary) != 1:
+        return None
+
+    names = [
+        e.name for e in linear if set(_nodes(e)) & inside and set(_nodes(e)) <= inside | boundary | {gnd}
+    ]
+    return boundary.pop(), names
+
+
+def _copy_element(element, netlist):
+    # ``Element.copy_to`` leaves the pins on the original netlist's nodes.
+    name = element.name[len(element.PREFIX) :]
+    nodes = _nodes(element)
+    if element.PREFIX == "R":
+        netlist.R(name, *nodes, element.resistance)
+    elif element.PREFIX == "C":
+        netlist.C(name, *nodes, element.capacitance)
+    elif element.PREFIX == "L":
+        netlist.L(name, *nodes, element.inductance)
+    elif element.PREFIX == "V":
+        netlist.V(name, *nodes, element.dc_value)
+    elif element.PREFIX == "Q":
+        netlist.BJT(name, *nodes, model=element.model)
+    elif element.PREFIX == "D":
+        netlist.D(name, *nodes, model=element.model)
+    else:
+        raise NotImplementedError(f"{element.name}: {type(element).__name__} is not supported")
+
+
+def split_circuit(circuit):
+    """Split ``circuit`` at its :func:`linear_section`.
+
+    Returns ``(front, section, node)``: ``front`` is the circuit without
+    the section, with ``out`` tied to ``node`` through a 0 V source, and
+    ``section`` is the linear network driven at ``node`` by a unit AC
+    source, ready for an AC analysis.  Returns ``None`` if there is no
+    linear section.
+    """
+
+    from PySpice.Spice.Netlist import Circuit
+
+    from .simulate import _detach_input
+
+    _detach_input(circuit)
+    found = linear_section(circuit)
+    if found is None:
+        return None
+    node, names = found
+
+    front = Circuit(f"{circuit.title}Front")
+    section = Circuit(f"{circuit.title}Section")
+    section.V("drive", node, section.gnd, "DC 0 AC 1")
+    for element in circuit.elements:
+        _copy_element(element, section if element.name in names else front)
+    # ``Netlist.copy_to`` can't clone models in PySpice 1.5.
+    for model in circuit.models:
+        front.model(model._name, model._model_type, **model._parameters)
+    front.V("sense", node, "out", 0)
+    return front, section, node
+
+
+def _levy(s, h, order, iterations):
+    """Sanathanan-Koerner iterations of Levy's fit; returns ``(b, a)`` in powers of ``s``."""
+    powers = s[:, np.newaxis] ** np.arange(order + 1)
+    weight = np.ones(len(s))
+    for _ in range(iterations):
+        # b_0..b_n and a_0..a_(n-1) of B(s) - H(s) A(s) = 0 with monic A.
+        matrix = np.hstack([powers, -h[:, np.newaxis] * powers[:, :order]])
+        matrix = matrix / weight[:, np.newaxis]
+        target = h * powers[:, order] / weight
+        solution, *_ = np.linalg.lstsq(
+            np.vstack([matrix.real, matrix.imag]),
+            np.concatenate([target.real, target.imag]),
+            rcond=None,
+        )
+        b = solution[: order + 1]
+        a = np.append(solution[order + 1 :], 1.0)
+        weight = np.abs(powers @ a)
+    return b, a
+
+
+def fit_transfer(frequencies, response, max_order, tolerance=1e-3, iterations=10):
+    """Fit a rational ``H(s)`` to a measured frequency response.
+
+    Tries orders up to ``max_order`` (the number of capacitors and
+    inductors) and keeps the lowest one whose error is below ``tolerance``
+    of the peak response; series capacitors, for example, only add one pole.
+    Each order is fitted with Sanathanan-Koerner iterations of Levy's
+    linear least-squares method on a frequency axis normalized to the
+    middle of the band.  Returns the analog ``(zeros, poles, gain)``; poles
+    in the right half-plane are reflected so the result is stable.
+    """
+
+    w0 = 2 * np.pi * np.sqrt(frequencies[0] * frequencies[-1])
+    s = 2j * np.pi * np.asarray(frequencies) / w0
+    h = np.asarray(response, dtype=complex)
+
+    best = None
+    for order in range(max_order + 1):
+        b, a = _levy(s, h, order, iterations)
+        fitted = np.polyval(b[::-1], s) / np.polyval(a[::-1], s)
+        error = np.max(np.abs(fitted - h)) / np.max(np.abs(h))
+        if best is None or error < best[0]:
+            best = error, b, a
+        if error < tolerance:
+            break
+    _, b, a = best
+    order = len(a) - 1
+
+    poles = np.roots(a[::-1])
+    poles = np.where(poles.real > 0, -poles.conj(), poles)
+    b = np.trim_zeros(np.where(np.abs(b) > 1e-12 * np.abs(b).max(), b, 0), "b")
+    zeros = np.roots(b[::-1])
+    gain = b[-1] * w0 ** (order - (len(b) - 1))
+    return zeros * w0, poles * w0, gain
+
+
+def equivalent_load(frequencies, impedance):
+    """``(resistance, capacitance)`` of a series RC approximating an input impedance.
+
+    The resistance is the impedance at the top of the band.  If the
+    impedance rises towards DC (a coupling capacitor blocks the bias) the
+    capacitance comes from the reactance at the bottom of the band,
+    otherwise it is ``None`` and the load is purely resistive.
+    """
+
+    impedance = np.asarray(impedance, dtype=complex)
+    resistance = float(impedance[-1].real)
+    if abs(impedance[0]) < 10 * abs(impedance[-1]):
+        return resistance, None
+    return resistance, float(-1 / (2 * np.pi * frequencies[0] * impedance[0].imag))
+
+
+def _ac_response(section):
+    from PySpice.Unit import u_Hz
+
+    simulator = section.simulator(temperature=25, nominal_temperature=25)
+    analysis = simulator.ac(
+        start_frequency=AC_START @ u_Hz,
+        stop_frequency=AC_STOP @ u_Hz,
+        number_of_points=AC_POINTS_PER_DECADE,
+        variation="dec",
+    )
+    # The source current flows into its positive node, out of the section.
+    current = -np.asarray(analysis.branches["vdrive"], dtype=complex)
+    return (
+        np.asarray(analysis.frequency, dtype=float),
+        np.asarray(analysis.out, dtype=complex),
+        1 / current,
+    )
+
+
+def fit_section(section, cache_dir=DEFAULT_CACHE_DIR):
+    """Run an AC analysis of the linear ``section`` and fit it.
+
+    Returns a dict with the analog ``zeros``, ``poles`` and ``gain`` of its
+    transfer function (see :func:`fit_transfer`) and the series ``load_r``
+    and ``load_c`` of its input impedance (see :func:`equivalent_load`;
+    ``load_c`` is NaN for a resistive load).  Results are cached in
+    ``cache_dir`` keyed by the netlist hash, so later runs skip ngspice.
+    """
+
+    digest = hashlib.sha256(str(section).encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"linear-{digest}.npz") if cache_dir else None
+    if path and os.path.exists(path):
+        with np.load(path) as data:
+            return {key: data[key] for key in data.files}
+
+    with stage("linear.ac"):
+        frequencies, response, impedance = _ac_response(section)
+    order = sum(1 for e in section.elements if e.PREFIX in ("C", "L"))
+    with stage("linear.fit"):
+        zeros, poles, gain = fit_transfer(frequencies, response, order)
+    load_r, load_c = equivalent_load(frequencies, impedance)
+    fit = {
+        "zeros": zeros,
+        "poles": poles,
+        "gain": np.real(gain),
+        "load_r": load_r,
+        "load_c": np.nan if load_c is None else load_c,
+    }
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(path, **fit)
+    return fit
+
+
+def section_sos(fit, fs):
+    """Second-order sections at ``fs`` for a :func:`fit_section` result (bilinear transform)."""
+    z, p, k = signal.bilinear_zpk(fit["zeros"], fit["poles"], float(fit["gain"]), fs)
+    return signal.zpk2sos(z, p, np.real(k))
+
+
+def _steady_state(sos, x0):
+    """Filter state ``(sections, 2) + shape(x0)`` for a constant input ``x0``."""
+    return np.multiply.outer(signal.sosfilt_zi(sos), x0)
+
+
+def apply_section(sos, x):
+    """Filter ``x`` with ``sos`` along axis 0, starting from the steady state of ``x[0]``.
+
+    The time-domain simulation starts from the DC operating point, so the
+    section's capacitors are already charged to the bias at its input.
+    """
+
+    if len(x) == 0:
+        return x
+    y, _ = signal.sosfilt(sos, x, axis=0, zi=_steady_state(sos, x[0]))
+    return y
+
+
+def section_blocks(sos, blocks):
+    """:func:`apply_section` for an iterable of blocks, keeping filter state."""
+    zi = None
+    for block in blocks:
+        if len(block) == 0:
+            yield block
+            continue
+        if zi is None:
+            zi = _steady_state(sos, block[0])
+        block, zi = signal.sosfilt(sos, block, axis=0, zi=zi)
+        yield block
+
+
+def split_front(circuit, cache_dir=DEFAULT_CACHE_DIR):
+    """``(front, fit)`` for :func:`simulate_split`.
+
+    ``front`` is the nonlinear part of ``circuit`` loaded with the
+    equivalent series RC of its linear section and ``fit`` the section's
+    :func:`fit_section` result, or ``(circuit, None)`` if there is no
+    linear section.
+    """
+
+    split = split_circuit(circuit)
+    if split is None:
+        log.info("%s has no linear output section; simulating it whole", circuit.title)
+        return circuit, None
+    front, section, node = split
+    fit = fit_section(section, cache_dir)
+    if np.isnan(fit["load_c"]):
+        front.R("section", node, front.gnd, float(fit["load_r"]))
+    else:
+        front.R("section", node, "section", float(fit["load_r"]))
+        front.C("section", "section", front.gnd, float(fit["load_c"]))
+    return front, fit
+
+
+def simulate_split(circuit, input_wave, fs, simulate=None, cache_dir=DEFAULT_CACHE_DIR):
+    """Simulate the nonlinear part of ``circuit`` and filter the linear rest.
+
+    The circuit is split with :func:`split_circuit` and its linear section
+    fitted with :func:`fit_section`.  Only the front, loaded with the
+    section's equivalent series RC so its output swing is preserved, is run
+    in the time domain (by ``simulate(front, wave, fs)``, by default
+    :func:`~guitarpedals.simulate.simulate_circuit`); the section is then
+    applied to its output as an IIR filter.  The load is an approximation,
+    so check the result with :func:`~guitarpedals.lut.lut_error`.
+    Circuits without a linear section are simulated whole.
+    """
+
+    if simulate is None:
+        from .simulate import simulate_circuit as simulate
+
+    input_wave = np.asarray(input_wave)
+    if input_wave.ndim > 1:
+        return np.stack(
+            [
+                simulate_split(circuit, column, fs, simulate, cache_dir)
+                for column in input_wave.T
+            ],
+            axis=1,
+        )
+
+    front, fit = split_front(circuit, cache_dir)
+    if fit is None:
+        return simulate(circuit, input_wave, fs)
+    y = simulate(front, input_wave, fs)
+    with stage("linear.filter", samples=len(y)):
+        return apply_section(section_sos(fit, fs), y)
@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+from PySpice.Unit import *
+
+from .cache import DEFAULT_CACHE_DIR
+from .profiling import stage
+from .simulate import _detach_input, circuit_hash, simulate_circuit
+
+
+def transfer_curve(circuit, span=1.0, points=4097):
+    """Sweep the input of ``circuit`` from ``-span`` to ``span`` volts.
+
+    Returns ``(vin, vout)`` arrays describing the static (DC) input-to-output
+    transfer curve.  Capacitors are open circuits in a DC sweep, so this only
+    describes circuits whose behaviour is essentially memoryless.
+    """
+
+    _detach_input(circuit)
+    circuit.V("input", "in", circuit.gnd, 0 @ u_V)
+    try:
+        simulator = circuit.simulator(temperature=25, nominal_temperature=25)
+        step = 2 * span / (points - 1)
+        analysis = simulator.dc(Vinput=slice(-span, span, step))
+    finally:
+        circuit.element("Vinput").detach()
+
+    return np.array(analysis.sweep), np.array(analysis.out)
+
+
+def cached_transfer_curve(circuit, span=1.0, points=4097, cache_dir=DEFAULT_CACHE_DIR):
+    """:func:`transfer_curve` cached on disk by netlist hash, span and size."""
+
+    os.makedirs(cache_dir, exist_ok=True)
+    key = f"{circuit_hash(circuit)[:16]}-{span:g}-{points}"
+    path = os.path.join(cache_dir, f"lut-{key}.npz")
+    if os.path.exists(path):
+        with np.load(path) as table:
+            return table["vin"], table["vout"]
+
+    vin, vout = transfer_curve(circuit, span, points)
+    np.savez(path, vin=vin, vout=vout)
+    return vin, vout
+
+
+def _span(peak):
+    """Sweep range for inputs up to ``peak`` volts.
+
+    Rounded up to whole volts so clips of similar level share a cached table.
+    """
+    return max(1.0, float(np.ceil(peak)))
+
+
+def simulate_lut(circuit, input_wave, fs, points=4097, cache_dir=DEFAULT_CACHE_DIR):
+    """Process ``input_wave`` through the static transfer curve of ``circuit``.
+
+    This is a drop-in replacement for
+    :func:`~guitarpedals.simulate.simulate_circuit` for memoryless stages
+    such as the diode clipper in :func:`~guitarpedals.circuits.overdrive_circuit`.
+    It runs at the native sample rate using vectorized interpolation; ``fs``
+    is accepted for signature compatibility only.
+    """
+
+    input_wave = np.asarray(input_wave, dtype=float)
+    span = _span(np.max(np.abs(input_wave), initial=0.0))
+    with stage("lut.transfer_curve"):
+        vin, vout = cached_transfer_curve(circuit, span, points, cache_dir)
+    with stage("lut.interpolate", samples=len(input_wave)):
+        return np.interp(input_wave, vin, vout)
+
+
+def lut_error(circuit, input_wave, fs, output, seconds=0.5):
+    """Error of a LUT ``output`` against ngspice, in dB relative to the signal.
+
+    Only the first ``seconds`` of ``input_wave`` are simulated with ngspice,
+    at ``fs`` itself like the full-band ``output``.  Values near -40 dB or
+    below mean the shortcut is transparent; values near 0 dB mean the
+    circuit is too reactive for a static transfer curve.
+    """
+
+    n = min(len(input_wave), int(seconds * fs))
+    reference = simulate_circuit(circuit, input_wave[:n], fs, target_fs=None)
+    error = np.sqrt(np.mean((reference - output[:n]) ** 2))
+    level = np.sqrt(np.mean(reference**2))
+    if level == 0:
+        return 0.0 if error == 0 else float("inf")
+    return 20 * np.log10(max(error, 1e-12) / level)
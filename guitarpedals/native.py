@@ -0,0 +1,356 @@
+import logging
+
+import numpy as np
+
+from .profiling import stage
+from .simulate import _detach_input
+
+log = logging.getLogger(__name__)
+
+try:
+    from numba import njit
+
+    JIT = True
+except ImportError:  # pragma: no cover - numba is optional
+    JIT = False
+
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+# Thermal voltage at the 25 °C used for the ngspice simulations.
+VT = 8.617333262e-5 * (273.15 + 25)
+# Conductance ngspice places across every pn junction.
+GMIN = 1e-12
+# Exponentials are continued linearly above this argument to avoid overflow
+# while Newton is still far from the solution.
+EXP_LIMIT = 40.0
+
+
+class NativeModel:
+    """A circuit compiled into arrays for :func:`simulate_native`.
+
+    The circuit is described with modified nodal analysis: the unknowns are
+    the non-ground node voltages followed by the currents through voltage
+    sources.  Resistors and sources go into a constant matrix, capacitors are
+    discretised with the trapezoidal rule (a conductance plus a history
+    current), and BJTs and diodes stay nonlinear and are handled by a Newton
+    solve at every sample.
+    """
+
+    def __init__(self, circuit):
+        _detach_input(circuit)
+        models = {model.name.lower(): model for model in circuit.models}
+
+        nodes = [name for name in circuit.node_names if name != "0"]
+        if "in" not in nodes or "out" not in nodes:
+            raise ValueError("circuit needs 'in' and 'out' nodes")
+        index = {name: i for i, name in enumerate(nodes)}
+        index["0"] = -1
+
+        resistors, capacitors, sources, bjts, diodes = [], [], [], [], []
+        for element in circuit.elements:
+            kind = type(element).__name__
+            pins = [index[node.name] for node in element.nodes]
+            if kind == "Resistor":
+                resistors.append((*pins, 1 / float(element.resistance)))
+            elif kind == "Capacitor":
+                capacitors.append((*pins, float(element.capacitance)))
+            elif kind == "VoltageSource":
+                sources.append((*pins, float(element.dc_value)))
+            elif kind == "BipolarJunctionTransistor":
+                model = models[element.model.lower()]
+                if model.model_type.upper() != "NPN":
+                    raise NotImplementedError("only NPN transistors are supported")
+                params = _parameters(model)
+                bjts.append(
+                    (
+                        *pins[:3],
+                        params.get("is", 1e-16),
+                        params.get("bf", 100.0),
+                        params.get("br", 1.0),
+                    )
+                )
+            elif kind == "Diode":
+                params = _parameters(models[element.model.lower()])
+                diodes.append((*pins, params.get("is", 1e-14), params.get("n", 1.0) * VT))
+            else:
+                raise NotImplementedError(f"{element.name}: {kind} is not supported")
+
+        # The input is one more voltage source, driving ``in`` from the audio.
+        sources.append((index["in"], -1, 0.0))
+
+        n_nodes = len(nodes)
+        size = n_nodes + len(sources)
+        self.size = size
+        self.out = index["out"]
+        self.input_row = size - 1
+
+        self.conductance = np.zeros((size, size))
+        # A GMIN shunt on every node keeps islands that are only connected
+        # through capacitors (open in the DC operating point) solvable.
+        self.conductance[:n_nodes, :n_nodes] += GMIN * np.eye(n_nodes)
+        for p, n, g in resistors:
+            _stamp(self.conductance, p, n, g)
+        self.rhs = np.zeros(size)
+        for k, (p, n, value) in enumerate(sources):
+            row = n_nodes + k
+            for node, sign in ((p, 1.0), (n, -1.0)):
+                if node >= 0:
+                    self.conductance[node, row] += sign
+                    self.conductance[row, node] += sign
+            self.rhs[row] = value
+
+        self.capacitors = _table(capacitors, 3)
+        self.bjts = _table(bjts, 6)
+        self.diodes = _table(diodes, 4)
+
+
+def _parameters(model):
+    return {key.lower(): float(model[key]) for key in model.parameters}
+
+
+def _stamp(matrix, p, n, g):
+    if p >= 0:
+        matrix[p, p] += g
+    if n >= 0:
+        matrix[n, n] += g
+    if p >= 0 and n >= 0:
+        matrix[p, n] -= g
+        matrix[n, p] -= g
+
+
+def _table(rows, width):
+    return np.array(rows, dtype=float).reshape(len(rows), width)
+
+
+@njit(cache=True)
+def _exp(x):
+    """``exp(x)`` and its derivative, continued linearly above ``EXP_LIMIT``."""
+    if x > EXP_LIMIT:
+        e = np.exp(EXP_LIMIT)
+        return e * (1.0 + x - EXP_LIMIT), e
+    e = np.exp(x)
+    return e, e
+
+
+@njit(cache=True)
+def _voltage(x, node):
+    return x[node] if node >= 0 else 0.0
+
+
+@njit(cache=True)
+def _add(vector, node, value):
+    if node >= 0:
+        vector[node] += value
+
+
+@njit(cache=True)
+def _add2(matrix, row, col, value):
+    if row >= 0 and col >= 0:
+        matrix[row, col] += value
+
+
+@njit(cache=True)
+def _newton(x, matrix, rhs, bjts, diodes, max_iter, tol):
+    """Solve ``matrix @ x + i(x) = rhs`` in place, starting from ``x``.
+
+    Returns the number of iterations used.
+    """
+
+    for iteration in range(max_iter):
+        jacobian = matrix.copy()
+        residual = matrix @ x - rhs
+
+        for k in range(bjts.shape[0]):
+            c, b, e = int(bjts[k, 0]), int(bjts[k, 1]), int(bjts[k, 2])
+            i_s, bf, br = bjts[k, 3], bjts[k, 4], bjts[k, 5]
+            vb = _voltage(x, b)
+            vbe = vb - _voltage(x, e)
+            vbc = vb - _voltage(x, c)
+            ef, dfe = _exp(vbe / VT)
+            er, dre = _exp(vbc / VT)
+            i_f = i_s * (ef - 1.0) + GMIN * vbe
+            i_r = i_s * (er - 1.0) + GMIN * vbc
+            gf = i_s * dfe / VT + GMIN
+            gr = i_s * dre / VT + GMIN
+
+            ic = i_f - i_r - i_r / br
+            ib = i_f / bf + i_r / br
+            # d(ic)/d(vbe), d(ic)/d(vbc), d(ib)/d(vbe), d(ib)/d(vbc)
+            dic_be, dic_bc = gf, -gr - gr / br
+            dib_be, dib_bc = gf / bf, gr / br
+
+            _add(residual, c, ic)
+            _add(residual, b, ib)
+            _add(residual, e, -ic - ib)
+            # vbe = vb - ve and vbc = vb - vc
+            for row, dbe, dbc in (
+                (c, dic_be, dic_bc),
+                (b, dib_be, dib_bc),
+                (e, -dic_be - dib_be, -dic_bc - dib_bc),
+            ):
+                _add2(jacobian, row, b, dbe + dbc)
+                _add2(jacobian, row, e, -dbe)
+                _add2(jacobian, row, c, -dbc)
+
+        for k in range(diodes.shape[0]):
+            a, cathode = int(diodes[k, 0]), int(diodes[k, 1])
+            i_s, nvt = diodes[k, 2], diodes[k, 3]
+            vd = _voltage(x, a) - _voltage(x, cathode)
+            ed, dd = _exp(vd / nvt)
+            i_d = i_s * (ed - 1.0) + GMIN * vd
+            g_d = i_s * dd / nvt + GMIN
+            _add(residual, a, i_d)
+            _add(residual, cathode, -i_d)
+            _add2(jacobian, a, a, g_d)
+            _add2(jacobian, cathode, cathode, g_d)
+            _add2(jacobian, a, cathode, -g_d)
+            _add2(jacobian, cathode, a, -g_d)
+
+        dx = np.linalg.solve(jacobian, -residual)
+        # Damp large steps so junction voltages can't jump far past the knee.
+        largest = np.max(np.abs(dx))
+        if largest > 0.5:
+            dx *= 0.5 / largest
+        x += dx
+        if largest < tol:
+            return iteration + 1
+    return max_iter
+
+
+@njit(cache=True)
+def _operating_point(conductance, rhs, input_row, bjts, diodes, first, tol):
+    """DC operating point with capacitors open, driven by the sample ``first``."""
+    x = np.zeros(conductance.shape[0])
+    source = rhs.copy()
+    source[input_row] = first
+    _newton(x, conductance, source, bjts, diodes, 200, tol)
+    return x
+
+
+@njit(cache=True)
+def _companion(conductance, capacitors, dt):
+    """Add the trapezoidal capacitor conductances; returns ``(matrix, g_c)``."""
+    matrix = conductance.copy()
+    g_c = np.empty(capacitors.shape[0])
+    for k in range(capacitors.shape[0]):
+        p, n = int(capacitors[k, 0]), int(capacitors[k, 1])
+        g_c[k] = 2.0 * capacitors[k, 2] / dt
+        _add2(matrix, p, p, g_c[k])
+        _add2(matrix, n, n, g_c[k])
+        _add2(matrix, p, n, -g_c[k])
+        _add2(matrix, n, p, -g_c[k])
+    return matrix, g_c
+
+
+@njit(cache=True)
+def _steps(
+    matrix, rhs, input_row, out, capacitors, g_c, bjts, diodes, x, v_c, i_c, input_wave, max_iter, tol
+):
+    """Step ``input_wave`` through the circuit, updating ``x``, ``v_c`` and ``i_c`` in place."""
+    n_caps = capacitors.shape[0]
+    output = np.empty(len(input_wave))
+    history = np.empty(n_caps)
+    for t in range(len(input_wave)):
+        source = rhs.copy()
+        source[input_row] = input_wave[t]
+        for k in range(n_caps):
+            p, n = int(capacitors[k, 0]), int(capacitors[k, 1])
+            history[k] = g_c[k] * v_c[k] + i_c[k]
+            _add(source, p, history[k])
+            _add(source, n, -history[k])
+
+        # ``x`` still holds the previous sample's solution: a warm start.
+        _newton(x, matrix, source, bjts, diodes, max_iter, tol)
+
+        for k in range(n_caps):
+            p, n = int(capacitors[k, 0]), int(capacitors[k, 1])
+            v_c[k] = _voltage(x, p) - _voltage(x, n)
+            i_c[k] = g_c[k] * v_c[k] - history[k]
+        output[t] = x[out]
+    return output
+
+
+# Whether the pure-Python fallback has been reported.
+_warned = False
+
+
+class NativeStream:
+    """Native simulation of ``circuit`` that keeps its state between blocks.
+
+    The first :meth:`process` call solves the DC operating point for its
+    first sample; every later call continues from the node voltages and
+    capacitor currents the previous one ended with, so processing a signal
+    in blocks gives the same result as processing it in one go.
+    """
+
+    def __init__(self, circuit, fs, max_iter=50, tol=1e-9):
+        global _warned
+        if not JIT and not _warned:
+            log.warning(
+                "numba is not installed; the native engine runs in pure Python, "
+                "several times slower than real time (pip install numba)"
+            )
+            _warned = True
+        with stage("native.compile"):
+            self.model = circuit if isinstance(circuit, NativeModel) else NativeModel(circuit)
+        self.matrix, self._g_c = _companion(
+            self.model.conductance, self.model.capacitors, 1.0 / fs
+        )
+        self.max_iter = max_iter
+        self.tol = tol
+        self._x = None
+
+    def _start(self, first):
+        model = self.model
+        self._x = _operating_point(
+            model.conductance, model.rhs, model.input_row, model.bjts, model.diodes, first, self.tol
+        )
+        caps = model.capacitors.astype(np.int64)
+        x = np.append(self._x, 0.0)  # index -1 (ground) reads 0 V
+        self._v_c = x[caps[:, 0]] - x[caps[:, 1]]
+        self._i_c = np.zeros(len(caps))
+
+    def process(self, input_wave):
+        input_wave = np.ascontiguousarray(input_wave, dtype=float)
+        if len(input_wave) == 0:
+            return input_wave.copy()
+        if self._x is None:
+            self._start(input_wave[0])
+        model = self.model
+        with stage("native.solve", samples=len(input_wave)):
+            return _steps(
+                self.matrix,
+                model.rhs,
+                model.input_row,
+                model.out,
+                model.capacitors,
+                self._g_c,
+                model.bjts,
+                model.diodes,
+                self._x,
+                self._v_c,
+                self._i_c,
+                input_wave,
+                self.max_iter,
+                self.tol,
+            )
+
+
+def simulate_native(circuit, input_wave, fs, max_iter=50, tol=1e-9):
+    """Simulate ``circuit`` without ngspice, at the native sample rate.
+
+    The netlist is compiled by :class:`NativeModel` and stepped one sample at
+    a time with a Newton solver warm-started from the previous sample.  The
+    inner loop is compiled with Numba when it is installed.  Resistors,
+    capacitors, DC voltage sources, diodes and NPN transistors (Ebers-Moll
+    with ``is``, ``bf`` and ``br``) are supported, which covers every circuit
+    in :mod:`guitarpedals.circuits`; ngspice via
+    :func:`~guitarpedals.simulate.simulate_circuit` remains the reference.
+    Use :class:`NativeStream` to process a signal block by block.
+    """
+
+    return NativeStream(circuit, fs, max_iter, tol).process(input_wave)
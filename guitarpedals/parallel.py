@@ -0,0 +1,126 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .simulate import DEFAULT_QUALITY, simulate_circuit
+
+
+def _simulate_window(circuit_factory, window, fs, target_fs):
+    """Worker entry point: build a fresh circuit and simulate one window."""
+    return simulate_circuit(circuit_factory(), window, fs, target_fs=target_fs)
+
+
+def _window_starts(length, window, overlap):
+    """Start offsets of overlapping windows covering ``length`` samples."""
+    hop = window - overlap
+    return list(range(0, max(length - overlap, 1), hop))
+
+
+def _crossfade(outputs, starts, length, overlap):
+    """Join simulated windows back into one signal.
+
+    The first half of every overlap is treated as pre-roll for the later
+    window (its circuit is still settling from the DC operating point) and is
+    discarded; the second half is a linear crossfade between the two windows.
+    """
+
+    out = np.zeros(length)
+    first = outputs[0]
+    out[: len(first)] = first
+
+    preroll = overlap // 2
+    fade = np.linspace(0.0, 1.0, overlap - preroll, endpoint=False)
+    for start, y in zip(starts[1:], outputs[1:]):
+        a = start + preroll
+        b = start + overlap
+        out[a:b] = out[a:b] * (1 - fade) + y[preroll:overlap] * fade
+        out[b : start + len(y)] = y[overlap:]
+    return out
+
+
+def simulate_parallel(
+    circuit_factory,
+    input_wave,
+    fs,
+    jobs=None,
+    window_seconds=2.0,
+    overlap_seconds=0.1,
+    target_fs=DEFAULT_QUALITY,
+    pool=None,
+):
+    """Simulate a long clip by spreading overlapping windows over processes.
+
+    ``circuit_factory`` is called in each worker to build its own circuit
+    (PySpice circuits cannot be pickled), so it must be a module-level
+    callable such as the functions in :mod:`guitarpedals.circuits`.  Each
+    window is passed through :func:`simulate_circuit` and the results are
+    crossfaded over ``overlap_seconds``.  ``jobs`` defaults to the number of
+    CPUs.
+
+    If a :class:`~guitarpedals.pool.SimulatorPool` is given as ``pool`` the
+    windows are run on its warm simulators instead of a fresh process pool.
+    """
+
+    input_wave = np.asarray(input_wave)
+    window = int(window_seconds * fs)
+    overlap = int(overlap_seconds * fs)
+    if overlap >= window:
+        raise ValueError("overlap_seconds must be shorter than window_seconds")
+
+    starts = _window_starts(len(input_wave), window, overlap)
+    if pool is not None:
+        circuit = circuit_factory()
+        futures = [
+            pool.submit(circuit, input_wave[start : start + window], fs, target_fs)
+            for start in starts
+        ]
+        outputs = [future.result() for future in futures]
+        return _crossfade(outputs, starts, len(input_wave), overlap)
+
+    if jobs == 1 or len(input_wave) <= window:
+        return simulate_circuit(circuit_factory(), input_wave, fs, target_fs=target_fs)
+
+    # Spawned, not forked: the parent may already have ngspice loaded.
+    with ProcessPoolExecutor(
+        max_workers=jobs, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futures = [
+            executor.submit(
+                _simulate_window,
+                circuit_factory,
+                input_wave[start : start + window],
+                fs,
+                target_fs,
+            )
+            for start in starts
+        ]
+        outputs = [future.result() for future in futures]
+
+    return _crossfade(outputs, starts, len(input_wave), overlap)
+
+
+def simulate_channels(simulate, input_wave, fs, jobs=None):
+    """Run ``simulate(channel, fs)`` on every channel of ``input_wave``.
+
+    ``input_wave`` is ``(n, channels)``; the channels are simulated
+    independently and concurrently, one worker process each (at most
+    ``jobs``), and stacked back into the same layout.  ``simulate`` must be
+    picklable, e.g. a module-level function or a :func:`functools.partial`
+    of one.  One-dimensional input is simulated directly.
+    """
+
+    input_wave = np.asarray(input_wave)
+    if input_wave.ndim == 1:
+        return simulate(input_wave, fs)
+
+    channels = [np.ascontiguousarray(input_wave[:, c]) for c in range(input_wave.shape[1])]
+    workers = min(jobs or len(channels), len(channels))
+    if workers == 1:
+        outputs = [simulate(channel, fs) for channel in channels]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            outputs = list(executor.map(simulate, channels, [fs] * len(channels)))
+    return np.stack(outputs, axis=1)
@@ -0,0 +1,240 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PySpice.Spice.NgSpice.Shared import NgSpiceShared
+
+from .profiling import count, stage
+from .simulate import (
+    DEFAULT_QUALITY,
+    _detach_input,
+    _on_grid,
+    raise_failure,
+    run_resampled,
+    solver_options,
+    solver_profile,
+    with_recovery,
+)
+
+# Element prefixes whose value is the last token on the line and can be
+# changed in a loaded circuit with ``alter`` (``dc`` for voltage sources).
+_ALTERABLE = {"R": "", "C": "", "L": "", "V": " dc"}
+
+
+class _ExternalSourceNgSpice(NgSpiceShared):
+    """``NgSpiceShared`` that plays a sample buffer into ``external`` sources.
+
+    ngspice asks for the source voltage through :meth:`get_vsrc_data` at
+    every time point, so a new stimulus only needs new arrays here rather
+    than a new netlist.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.wave = np.zeros(1)
+        self.fs = 1.0
+
+    def get_vsrc_data(self, voltage, time, node, ngspice_id):
+        position = time * self.fs
+        index = int(position)
+        if index >= len(self.wave) - 1:
+            voltage[0] = self.wave[-1]
+        else:
+            frac = position - index
+            voltage[0] = self.wave[index] + frac * (self.wave[index + 1] - self.wave[index])
+        return 0
+
+
+def external_netlist(circuit):
+    """Netlist text for ``circuit`` with an ``external`` input source."""
+    _detach_input(circuit)
+    return (
+        str(circuit)
+        + "Vinput in 0 dc 0 external\n"
+        + ".options TEMP=25 TNOM=25 INTERP\n"
+        + ".end\n"
+    )
+
+
+def _with_options(netlist, options):
+    """``netlist`` from :func:`external_netlist` with an extra ``.options`` line."""
+    return netlist[: -len(".end\n")] + f".options {options}\n.end\n"
+
+
+def _alterations(old, new):
+    """``alter`` commands turning netlist ``old`` into ``new``.
+
+    Returns ``None`` when the two differ in anything other than plain
+    component values, in which case the circuit has to be reloaded.
+    """
+
+    old_lines = old.splitlines()
+    new_lines = new.splitlines()
+    if len(old_lines) != len(new_lines):
+        return None
+
+    commands = []
+    for before, after in zip(old_lines, new_lines):
+        if before == after:
+            continue
+        before, after = before.split(), after.split()
+        parameter = _ALTERABLE.get(before[0][:1].upper())
+        if parameter is None or len(before) != 4 or before[:-1] != after[:-1]:
+            return None
+        commands.append(f"alter {before[0].lower()}{parameter} = {after[-1]}")
+    return commands
+
+
+class WarmSimulator:
+    """An in-process ngspice instance that keeps its circuit loaded.
+
+    Successive :meth:`run` calls only swap the stimulus buffer; if the
+    netlist differs from the loaded one only in component values those are
+    changed with ``alter`` instead of parsing the circuit again.  Solver
+    settings are applied with ``option`` before every transient.  Retries
+    with relaxed settings reload the circuit with them as ``.options``, and
+    the next run reloads it without, so they don't leak into it.
+    """
+
+    def __init__(self):
+        self._ngspice = _ExternalSourceNgSpice(ngspice_id=0, send_data=False)
+        self._netlist = None
+        self._profile = None
+        self._relaxed = False
+        self.reloads = 0
+
+    def _load(self, netlist):
+        if self._relaxed:
+            self._ngspice.remove_circuit()
+            self._netlist = None
+            self._relaxed = False
+        if self._netlist is not None:
+            commands = _alterations(self._netlist, netlist)
+            if commands is not None:
+                for command in commands:
+                    self._ngspice.exec_command(command)
+                self._netlist = netlist
+                return
+            self._ngspice.remove_circuit()
+        self._ngspice.load_circuit(netlist)
+        self._netlist = netlist
+        self.reloads += 1
+
+    def _tran(self, netlist, settings, input_wave, fs):
+        options = " ".join(f"{key}={value}" for key, value in solver_options(settings).items())
+        if settings is self._profile:
+            self._ngspice.exec_command(f"option {options}")
+        else:
+            # Options such as rshunt and gmin only take effect when the
+            # circuit is parsed, so relaxed retries load it again with them.
+            self._ngspice.remove_circuit()
+            self._ngspice.load_circuit(_with_options(netlist, options))
+            self._relaxed = True
+        self._ngspice.exec_command(f"alter vinput dc = {float(input_wave[0])}")
+        try:
+            self._ngspice.exec_command(
+                f"tran {1 / fs} {len(input_wave) / fs} 0 {settings['max_step'] / fs}"
+            )
+            plot = self._ngspice.plot(None, self._ngspice.last_plot)
+            vectors = {vector.simplified_name: vector for vector in plot.values()}
+            return (
+                np.asarray(vectors["time"].to_waveform(to_real=True)),
+                np.asarray(vectors["out"].to_waveform(to_real=True)),
+            )
+        except NameError as error:
+            raise_failure(self._ngspice, error)
+        finally:
+            self._ngspice.destroy()
+
+    def transient(self, netlist, input_wave, fs, profile=DEFAULT_QUALITY):
+        """Simulate ``input_wave`` at ``fs`` and return ``len(input_wave)`` samples.
+
+        ``profile`` selects the solver settings as in
+        :func:`~guitarpedals.simulate.simulate_circuit`, including the
+        retries with relaxed settings.
+        """
+
+        with stage("pool.load"):
+            self._load(netlist)
+        with stage("simulate.transient", samples=len(input_wave)):
+            self._ngspice.wave = np.asarray(input_wave, dtype=float)
+            self._ngspice.fs = fs
+            self._profile = solver_profile(profile)
+            time, out = with_recovery(
+                lambda settings: self._tran(netlist, settings, input_wave, fs), self._profile
+            )
+        count("ngspice_timesteps", len(time))
+
+        return _on_grid(time, out, len(input_wave), fs)
+
+    def run(self, netlist, input_wave, fs, target_fs=DEFAULT_QUALITY, profile=None):
+        """Like :func:`~guitarpedals.simulate.simulate_circuit` for ``netlist``."""
+        profile = solver_profile(target_fs if profile is None else profile)
+        return run_resampled(
+            lambda wave, rate: self.transient(netlist, wave, rate, profile),
+            input_wave,
+            fs,
+            target_fs,
+        )
+
+
+# One warm simulator per worker process.
+_worker = None
+
+
+def warm_simulator():
+    """The :class:`WarmSimulator` of this process, created on first use."""
+    global _worker
+    if _worker is None:
+        _worker = WarmSimulator()
+    return _worker
+
+
+def _init_worker():
+    warm_simulator()
+
+
+def _run_in_worker(netlist, input_wave, fs, target_fs):
+    return warm_simulator().run(netlist, input_wave, fs, target_fs)
+
+
+class SimulatorPool:
+    """A pool of ``size`` warm ngspice simulators.
+
+    Every simulator lives in its own worker process (the ngspice shared
+    library is not reentrant, so one process holds one instance) and keeps
+    the last circuit it ran loaded.  Circuits are sent to the workers as
+    netlist text because PySpice circuits cannot be pickled.
+
+    Example::
+
+        with SimulatorPool(size=4) as pool:
+            y = pool.run(fuzz_circuit(), audio, fs)
+    """
+
+    def __init__(self, size=1):
+        self.size = size
+        self._executor = ProcessPoolExecutor(
+            max_workers=size,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def submit(self, circuit, input_wave, fs, target_fs=DEFAULT_QUALITY):
+        """Queue a simulation and return a :class:`concurrent.futures.Future`."""
+        return self._executor.submit(
+            _run_in_worker, external_netlist(circuit), np.asarray(input_wave), fs, target_fs
+        )
+
+    def run(self, circuit, input_wave, fs, target_fs=DEFAULT_QUALITY):
+        """Simulate ``circuit`` on ``input_wave``; see :func:`simulate_circuit`."""
+        return self.submit(circuit, input_wave, fs, target_fs).result()
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,135 @@
+import contextlib
+import functools
+import os
+import threading
+import time
+
+_active = None
+_NULL = contextlib.nullcontext()
+
+
+class Profiler:
+    """Collects stage timings and counters.
+
+    Instrumented code wraps its work in :func:`stage` blocks (or uses the
+    :func:`instrument` decorator) and reports counts with :func:`count`.
+    When no profiler is active :func:`stage` returns a shared no-op context
+    manager, so the instrumentation costs one global lookup per call.  Only
+    the current process is profiled; work done in pool workers is not
+    included.
+
+    ``callback``, if given, is called with a dict for every finished stage
+    (``name``, ``start``, ``seconds`` and any counts passed to
+    :func:`stage`).
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.stages = {}
+        self.counters = {}
+        self.events = []
+        self._origin = time.perf_counter()
+
+    def _record(self, name, start, seconds, counts):
+        totals = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+        totals["seconds"] += seconds
+        totals["calls"] += 1
+        for key, value in counts.items():
+            totals[key] = totals.get(key, 0) + value
+        event = {"name": name, "start": start - self._origin, "seconds": seconds, **counts}
+        self.events.append(event)
+        if self.callback is not None:
+            self.callback(event)
+
+    def metrics(self):
+        """Per-stage totals and counters as a plain dict."""
+        return {"stages": self.stages, "counters": self.counters}
+
+    def report(self):
+        """A text table of the per-stage breakdown, slowest first."""
+        lines = [f"{'stage':<32}{'calls':>7}{'seconds':>10}{'samples':>12}"]
+        ordered = sorted(self.stages.items(), key=lambda item: -item[1]["seconds"])
+        for name, totals in ordered:
+            samples = totals.get("samples", "")
+            lines.append(
+                f"{name:<32}{totals['calls']:>7}{totals['seconds']:>10.3f}{samples:>12}"
+            )
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:<32}{value:>29}")
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        """The recorded stages in Chrome trace-event format (``chrome://tracing``)."""
+        pid = os.getpid()
+        events = [
+            {
+                "name": event["name"],
+                "ph": "X",
+                "ts": event["start"] * 1e6,
+                "dur": event["seconds"] * 1e6,
+                "pid": pid,
+                "tid": threading.get_ident(),
+                "args": {
+                    key: value
+                    for key, value in event.items()
+                    if key not in ("name", "start", "seconds")
+                },
+            }
+            for event in self.events
+        ]
+        return {"traceEvents": events, "otherData": {"counters": self.counters}}
+
+
+@contextlib.contextmanager
+def profile(callback=None):
+    """Activate a new :class:`Profiler` for the duration of the block::
+
+        with profile() as profiler:
+            y = simulate_circuit(circuit, audio, fs)
+        print(profiler.report())
+    """
+    global _active
+    previous = _active
+    _active = Profiler(callback)
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+
+@contextlib.contextmanager
+def _timed_stage(profiler, name, counts):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler._record(name, start, time.perf_counter() - start, counts)
+
+
+def stage(name, **counts):
+    """Context manager timing ``name``; ``counts`` (e.g. ``samples``) are summed."""
+    if _active is None:
+        return _NULL
+    return _timed_stage(_active, name, counts)
+
+
+def count(name, value=1):
+    """Add ``value`` to the counter ``name`` of the active profiler."""
+    if _active is not None:
+        _active.counters[name] = _active.counters.get(name, 0) + value
+
+
+def instrument(name):
+    """Decorator timing a function whose first argument is a signal."""
+
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(x, *args, **kwargs):
+            if _active is None:
+                return func(x, *args, **kwargs)
+            with _timed_stage(_active, name, {"samples": len(x)}):
+                return func(x, *args, **kwargs)
+
+        return wrapper
+
+    return decorate
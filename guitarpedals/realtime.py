@@ -0,0 +1,162 @@
+import time
+
+import numpy as np
+
+from .cache import DEFAULT_CACHE_DIR
+from .circuits import CIRCUITS
+
+
+class _Normalize:
+    """Streaming :func:`~guitarpedals.dsp.normalize`: divide by the peak seen so far."""
+
+    def __init__(self):
+        self.peak = 0.0
+
+    def process(self, x):
+        if len(x):
+            self.peak = max(self.peak, float(np.max(np.abs(x))))
+        return x / self.peak if self.peak else x
+
+
+class _Channels:
+    """Run one mono processor per channel of ``(n, channels)`` blocks."""
+
+    def __init__(self, processors):
+        self.processors = processors
+
+    def process(self, x):
+        if x.ndim == 1:
+            return self.processors[0].process(x)
+        return np.stack(
+            [p.process(column) for p, column in zip(self.processors, x.T)], axis=1
+        )
+
+
+class PedalProcessor:
+    """A pedal chain processed one fixed-size buffer at a time.
+
+    ``chain`` is a circuit name from :data:`~guitarpedals.circuits.CIRCUITS`
+    (played through the usual 5 kHz low-pass) or a chain as accepted by
+    :func:`~guitarpedals.chain.load_chain`; it is planned with
+    :func:`~guitarpedals.chain.plan_chain`, so linear filters are fused and
+    oversampling is shared, and every step becomes a stateful block
+    processor: circuits a :class:`~guitarpedals.native.NativeStream` (ngspice
+    cannot run in real time), resampling a :class:`~guitarpedals.dsp.Resampler`,
+    filters a :class:`~guitarpedals.dsp.SOSFilter`, delay and chorus their
+    classes, reverb a :class:`~guitarpedals.reverb.PartitionedConvolver`
+    partitioned at ``block_size`` and ``normalize`` a running-peak gain.
+
+    :meth:`process_block` takes exactly ``block_size`` samples and returns
+    as many.  Resampling and reverb produce output with a delay; the first
+    blocks are padded with silence so the added :attr:`latency` (in
+    samples) is constant afterwards.
+    """
+
+    def __init__(self, chain, fs, block_size=256, channels=1, cache_dir=DEFAULT_CACHE_DIR):
+        from .chain import default_chain, load_chain, plan_chain
+
+        if isinstance(chain, str):
+            if chain in CIRCUITS:
+                chain = default_chain(chain)[:-1]
+            else:
+                chain = load_chain(chain)
+        self.fs = fs
+        self.block_size = block_size
+        self.channels = channels
+        self.latency = 0
+        self._fifo = np.zeros((0,) + self._shape())
+        self._steps = [self._processor(step, cache_dir) for step in plan_chain(chain, fs)]
+
+    def _shape(self):
+        return () if self.channels == 1 else (self.channels,)
+
+    def _processor(self, step, cache_dir):
+        from . import dsp
+
+        sr = self.fs * step["factor"]
+        if step["op"] == "resample":
+            return dsp.Resampler(step["up"], step["down"])
+        if step["op"] == "circuit":
+            from .native import NativeStream
+
+            return _Channels(
+                [NativeStream(CIRCUITS[step["name"]](), sr) for _ in range(self.channels)]
+            )
+        if step["op"] == "sos":
+            return dsp.SOSFilter(step["sos"])
+
+        spec = step["stage"]
+        if spec["type"] == "delay":
+            return dsp.Delay(sr, spec.get("time", 0.3), spec.get("feedback", 0.5))
+        if spec["type"] == "chorus":
+            return dsp.Chorus(sr, spec.get("depth_ms", 15), spec.get("rate", 0.25))
+        if spec["type"] == "normalize":
+            return _Normalize()
+        from .reverb import cached_ir
+
+        partition = self.block_size * step["factor"]
+        return cached_ir(spec["ir"], sr, block_size=partition, cache_dir=cache_dir)
+
+    def process_block(self, block):
+        """Process ``block_size`` samples and return ``block_size`` samples."""
+        block = np.asarray(block)
+        if len(block) != self.block_size:
+            raise ValueError(f"expected {self.block_size} samples, got {len(block)}")
+        y = block.astype(float)
+        for step in self._steps:
+            y = step.process(y)
+
+        fifo = np.concatenate([self._fifo, y])
+        missing = self.block_size - len(fifo)
+        if missing > 0:
+            fifo = np.concatenate([np.zeros((missing,) + fifo.shape[1:]), fifo])
+            self.latency += missing
+        self._fifo = fifo[self.block_size :]
+        return fifo[: self.block_size].astype(block.dtype if block.dtype.kind == "f" else float)
+
+
+def run_live(processor, audio, realtime=False, warmup=8):
+    """Feed ``audio`` through ``processor`` in blocks as an audio callback would.
+
+    ``warmup`` blocks of silence are processed first (compiling the solver
+    and settling the circuit, as when a pedal is switched on before
+    playing).  With ``realtime`` every block waits for the moment it would
+    arrive from the sound card.  Returns ``(output, stats)``: the processed
+    audio (the last partial block is zero-padded) and a dict with the
+    per-block ``latency_ms`` percentiles and maximum, the block
+    ``deadline_ms``, the number of ``missed`` deadlines, the ``blocks``
+    processed, the real-time factor ``load`` (compute time over audio time)
+    and the processor's ``latency_samples``.
+    """
+
+    n = processor.block_size
+    silence = np.zeros((n,) + np.shape(audio)[1:], dtype=np.asarray(audio).dtype)
+    for _ in range(warmup):
+        processor.process_block(silence)
+
+    blocks = -(-len(audio) // n)
+    padded = np.zeros((blocks * n,) + np.shape(audio)[1:], dtype=np.asarray(audio).dtype)
+    padded[: len(audio)] = audio
+    deadline = n / processor.fs
+    times = np.empty(blocks)
+    out = []
+    start = time.perf_counter()
+    for i in range(blocks):
+        if realtime:
+            delay = start + (i + 1) * deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        t0 = time.perf_counter()
+        out.append(processor.process_block(padded[i * n : (i + 1) * n]))
+        times[i] = time.perf_counter() - t0
+
+    p50, p90, p99 = np.percentile(times, [50, 90, 99]) * 1000 if blocks else (0.0, 0.0, 0.0)
+    stats = {
+        "blocks": blocks,
+        "deadline_ms": deadline * 1000,
+        "latency_ms": {"p50": p50, "p90": p90, "p99": p99, "max": times.max() * 1000 if blocks else 0.0},
+        "missed": int(np.sum(times > deadline)),
+        "load": float(times.sum() / (blocks * deadline)) if blocks else 0.0,
+        "latency_samples": processor.latency,
+    }
+    return (np.concatenate(out) if out else padded), stats
@@ -0,0 +1,152 @@
+import hashlib
+import os
+
+import numpy as np
+
+from .cache import DEFAULT_CACHE_DIR
+from .profiling import stage
+
+# Partition length in samples: the latency of streaming convolution.
+DEFAULT_PARTITION = 1024
+
+
+def ir_spectra(ir, block_size=DEFAULT_PARTITION):
+    """Spectra of ``ir`` cut into ``block_size`` partitions.
+
+    Returns a complex array of shape ``(partitions, block_size + 1, channels)``
+    for :class:`PartitionedConvolver`.
+    """
+
+    ir = np.asarray(ir, dtype=float)
+    if ir.ndim == 1:
+        ir = ir[:, np.newaxis]
+    partitions = max(1, -(-len(ir) // block_size))
+    padded = np.zeros((partitions * block_size, ir.shape[1]))
+    padded[: len(ir)] = ir
+    padded = padded.reshape(partitions, block_size, ir.shape[1])
+    return np.fft.rfft(padded, n=2 * block_size, axis=1)
+
+
+class PartitionedConvolver:
+    """Uniformly partitioned overlap-save convolution, fed block by block.
+
+    The impulse response is split into partitions of ``block_size`` samples
+    whose spectra are computed once (see :func:`ir_spectra` and
+    :func:`cached_ir`).  Every ``block_size`` input samples are transformed
+    once and multiplied with all partitions through a frequency-domain
+    delay line, so the cost per sample does not depend on the signal length
+    and the latency is one block.
+
+    :meth:`process` returns the output for every complete block received so
+    far and :meth:`flush` the rest, including the full reverb tail: the
+    concatenated output has ``len(x) + ir_length - 1`` samples.  A mono IR
+    is applied to every input channel; a multichannel IR is applied per
+    channel, and a mono input is spread over the IR's channels.
+    """
+
+    def __init__(self, spectra, ir_length):
+        self.spectra = spectra
+        self.block_size = spectra.shape[1] - 1
+        self.ir_length = ir_length
+        self._pending = None
+        self._previous = None
+        self._delay_line = None
+        self._position = 0
+        self._received = 0
+        self._produced = 0
+
+    @classmethod
+    def from_ir(cls, ir, block_size=DEFAULT_PARTITION):
+        return cls(ir_spectra(ir, block_size), len(ir))
+
+    def _start(self, x):
+        channels = 1 if x.ndim == 1 else x.shape[1]
+        ir_channels = self.spectra.shape[2]
+        if channels != ir_channels and 1 not in (channels, ir_channels):
+            raise ValueError(f"{channels}-channel input with a {ir_channels}-channel IR")
+        self._squeeze = x.ndim == 1 and ir_channels == 1
+        self._channels = max(channels, ir_channels)
+        self._dtype = x.dtype if x.dtype.kind == "f" else np.dtype(float)
+        self._pending = np.zeros((0, channels))
+        self._previous = np.zeros((self.block_size, channels))
+        self._delay_line = np.zeros(
+            (len(self.spectra), self.block_size + 1, channels), dtype=complex
+        )
+
+    def _block(self, block):
+        b = self.block_size
+        spectrum = np.fft.rfft(np.concatenate([self._previous, block]), axis=0)
+        self._previous = block
+        self._delay_line[self._position] = spectrum
+        order = (self._position - np.arange(len(self.spectra))) % len(self.spectra)
+        self._position = (self._position + 1) % len(self.spectra)
+        total = (self.spectra * self._delay_line[order]).sum(axis=0)
+        return np.fft.irfft(total, n=2 * b, axis=0)[b:]
+
+    def _run(self, stop):
+        blocks = []
+        b = self.block_size
+        while len(self._pending) >= b:
+            blocks.append(self._block(self._pending[:b]))
+            self._pending = self._pending[b:]
+        y = np.concatenate(blocks) if blocks else np.zeros((0, self._channels))
+        y = y[: max(0, stop - self._produced)]
+        self._produced += len(y)
+        y = y.astype(self._dtype, copy=False)
+        return y[:, 0] if self._squeeze else y
+
+    def process(self, x):
+        x = np.asarray(x)
+        if self._pending is None:
+            self._start(x)
+        with stage("reverb.convolve", samples=len(x)):
+            block = x[:, np.newaxis] if x.ndim == 1 else x
+            self._pending = np.concatenate([self._pending, block])
+            self._received += len(x)
+            return self._run(self._received + self.ir_length - 1)
+
+    def flush(self):
+        """Return the remaining output and the reverb tail."""
+        if self._pending is None:
+            return np.zeros(0)
+        stop = self._received + self.ir_length - 1
+        missing = stop - self._produced - len(self._pending)
+        b = self.block_size
+        padding = np.zeros((-(-max(missing, 0) // b) * b + b, self._pending.shape[1]))
+        self._pending = np.concatenate([self._pending, padding])
+        with stage("reverb.convolve", samples=len(padding)):
+            return self._run(stop)
+
+    def convolve(self, x):
+        """Process the whole signal ``x`` and return it with its tail."""
+        return np.concatenate([self.process(x), self.flush()])
+
+
+def cached_ir(path, fs, block_size=DEFAULT_PARTITION, cache_dir=DEFAULT_CACHE_DIR):
+    """:class:`PartitionedConvolver` for the IR file ``path`` at rate ``fs``.
+
+    The IR is resampled to ``fs`` and partitioned once; the spectra are
+    cached on disk keyed by the file contents, rate and partition size
+    unless ``cache_dir`` is ``None``.
+    """
+
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    cache_path = (
+        os.path.join(cache_dir, f"reverb-{digest}-{int(fs)}-{block_size}.npz") if cache_dir else None
+    )
+    if cache_path and os.path.exists(cache_path):
+        with np.load(cache_path) as data:
+            return PartitionedConvolver(data["spectra"], int(data["length"]))
+
+    import soundfile as sf
+    from scipy import signal
+
+    ir, ir_fs = sf.read(path, dtype="float32")
+    if ir_fs != fs:
+        ir = signal.resample_poly(ir, int(fs), ir_fs, axis=0)
+    spectra = ir_spectra(ir, block_size)
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(cache_path, spectra=spectra, length=len(ir))
+    return PartitionedConvolver(spectra, len(ir))
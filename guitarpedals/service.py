@@ -0,0 +1,291 @@
+import asyncio
+import io
+import json
+import logging
+import multiprocessing
+import os
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+from .cache import DEFAULT_CACHE_DIR
+from .circuits import CIRCUITS
+from .simulate import DEFAULT_QUALITY, QUALITY_BANDWIDTH
+
+log = logging.getLogger(__name__)
+
+# Bytes written to the socket at a time when streaming a result back.
+CHUNK = 65536
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def _init_worker(engine, target_fs, cache_dir):
+    """Build every circuit and run one tiny simulation so the first job is warm."""
+    from .batch import _circuit, _simulate
+
+    for name in CIRCUITS:
+        _circuit(name)
+    try:
+        _simulate(engine, _circuit("fuzz"), np.zeros(64), 44100, target_fs, cache_dir)
+    except Exception:  # the job itself will report the error
+        log.warning("warming up the %s engine failed", engine, exc_info=True)
+
+
+def _render(audio, fs, stages, engine, target_fs, cache_dir):
+    """Worker entry point: run the chain ``stages`` on ``audio``."""
+    from .batch import _circuit, _simulate
+    from .chain import run_chain
+
+    def simulate(name, x, rate):
+        if x.ndim > 1:
+            return np.stack([simulate(name, column, rate) for column in x.T], axis=1)
+        return _simulate(engine, _circuit(name), x, rate, target_fs, cache_dir)
+
+    y = run_chain(stages, audio, fs, simulate, cache_dir=cache_dir)
+    return np.asarray(y, dtype=np.float32)
+
+
+class _HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class RenderService:
+    """A local HTTP service rendering audio through pedal chains.
+
+    Jobs run on ``workers`` spawned processes that are warmed up when the
+    service starts (circuits built, engine libraries loaded, a first
+    simulation run) and keep their warm simulator between jobs, so a
+    request pays neither interpreter start-up nor imports.  At most
+    ``max_queue`` jobs wait for a worker; more are refused with 503.
+
+    Endpoints:
+
+    ``POST /render``
+        The body is a WAV file.  Query parameters: ``circuit`` (default
+        ``fuzz``) or ``chain`` (see :func:`~guitarpedals.chain.parse_chain`;
+        a JSON list is also accepted), ``engine`` and ``quality``.  The
+        rendered float WAV is streamed back.  Reverb stages are refused
+        unless the service has an ``ir_dir``, and their ``ir`` is a file
+        name within it; clients never name other server-side paths.
+    ``GET /metrics``
+        JSON with the queue depth, jobs in flight, completed and failed
+        counts, throughput and job latency percentiles.
+    ``GET /health``
+        ``{"status": "ok"}``.
+    """
+
+    def __init__(
+        self,
+        workers=None,
+        engine="spice",
+        target_fs=DEFAULT_QUALITY,
+        cache_dir=DEFAULT_CACHE_DIR,
+        max_queue=64,
+        ir_dir=None,
+    ):
+        self.engine = engine
+        self.ir_dir = os.path.realpath(ir_dir) if ir_dir else None
+        self.target_fs = target_fs
+        self.cache_dir = cache_dir
+        self.max_queue = max_queue
+        self.workers = workers or os.cpu_count()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(engine, target_fs, cache_dir),
+        )
+        self._started = time.perf_counter()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._audio_seconds = 0.0
+        self._latencies = []
+
+    def warm_up(self):
+        """Start every worker process and wait until they are initialized."""
+        futures = [self._executor.submit(time.sleep, 0.05) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def metrics(self):
+        uptime = time.perf_counter() - self._started
+        latencies = np.asarray(self._latencies[-1000:])
+        percentiles = (
+            dict(zip(("p50", "p90", "p99"), np.percentile(latencies, [50, 90, 99]).tolist()))
+            if len(latencies)
+            else {}
+        )
+        return {
+            "workers": self.workers,
+            "queue_depth": max(0, self._pending - self.workers),
+            "in_flight": min(self._pending, self.workers),
+            "completed": self._completed,
+            "failed": self._failed,
+            "uptime_seconds": uptime,
+            "jobs_per_second": self._completed / uptime if uptime else 0.0,
+            "audio_seconds_per_second": self._audio_seconds / uptime if uptime else 0.0,
+            "latency_seconds": percentiles,
+        }
+
+    def _job(self, query, body):
+        from .chain import default_chain, load_chain, parse_chain
+
+        try:
+            audio, fs = sf.read(io.BytesIO(body), dtype="float32")
+        except Exception as error:
+            raise _HTTPError(400, f"unreadable audio: {error}")
+        try:
+            if "chain" in query:
+                chain = query["chain"]
+                stages = load_chain(json.loads(chain)) if chain.startswith("[") else parse_chain(chain)
+            else:
+                circuit = query.get("circuit", "fuzz")
+                if circuit not in CIRCUITS:
+                    raise ValueError(f"Unknown circuit '{circuit}'")
+                stages = default_chain(circuit)
+            stages = [self._ir_stage(spec) if spec["type"] == "reverb" else spec for spec in stages]
+        except ValueError as error:
+            raise _HTTPError(400, str(error))
+        except (TypeError, KeyError) as error:
+            raise _HTTPError(400, f"invalid chain: {type(error).__name__}: {error}")
+        engine = query.get("engine", self.engine)
+        if engine not in ("spice", "lut", "native", "split"):
+            raise _HTTPError(400, f"Unknown engine '{engine}'")
+        target_fs = query.get("quality", self.target_fs)
+        if target_fs not in QUALITY_BANDWIDTH:
+            try:
+                target_fs = float(target_fs)
+            except ValueError:
+                raise _HTTPError(400, f"Unknown quality '{target_fs}'")
+        return audio, fs, stages, engine, target_fs
+
+    def _ir_stage(self, spec):
+        """``spec`` with its IR resolved inside :attr:`ir_dir`, or a 400 error."""
+        if self.ir_dir is None:
+            raise _HTTPError(400, "reverb is disabled: the service has no IR directory")
+        path = os.path.realpath(os.path.join(self.ir_dir, spec["ir"]))
+        if os.path.commonpath([path, self.ir_dir]) != self.ir_dir or not os.path.isfile(path):
+            raise _HTTPError(400, f"unknown impulse response '{spec['ir']}'")
+        return {**spec, "ir": path}
+
+    async def render(self, query, body):
+        """Render one job and return the output as WAV bytes."""
+        audio, fs, stages, engine, target_fs = self._job(query, body)
+        if self._pending >= self.workers + self.max_queue:
+            raise _HTTPError(503, "queue full")
+
+        self._pending += 1
+        start = time.perf_counter()
+        try:
+            y = await asyncio.get_running_loop().run_in_executor(
+                self._executor, _render, audio, fs, stages, engine, target_fs, self.cache_dir
+            )
+        except Exception as error:
+            self._failed += 1
+            log.exception("render job failed")
+            raise _HTTPError(500, f"{type(error).__name__}: {error}")
+        finally:
+            self._pending -= 1
+        self._completed += 1
+        self._audio_seconds += len(audio) / fs
+        self._latencies.append(time.perf_counter() - start)
+
+        out = io.BytesIO()
+        sf.write(out, y, fs, subtype="FLOAT", format="WAV")
+        return out.getvalue()
+
+    async def _respond(self, writer, status, body, content_type):
+        writer.write(
+            (
+                f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode()
+        )
+        for start in range(0, len(body), CHUNK):
+            writer.write(body[start : start + CHUNK])
+            await writer.drain()
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            method, target, _ = request.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+            url = urllib.parse.urlsplit(target)
+            query = dict(urllib.parse.parse_qsl(url.query))
+            if method == "GET" and url.path == "/metrics":
+                await self._respond(writer, 200, json.dumps(self.metrics()).encode(), "application/json")
+            elif method == "GET" and url.path == "/health":
+                await self._respond(writer, 200, b'{"status": "ok"}', "application/json")
+            elif method == "POST" and url.path == "/render":
+                wav = await self.render(query, body)
+                await self._respond(writer, 200, wav, "audio/wav")
+            else:
+                raise _HTTPError(404, f"no route for {method} {url.path}")
+        except _HTTPError as error:
+            body = json.dumps({"error": str(error)}).encode()
+            await self._respond(writer, error.status, body, "application/json")
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8765):
+        """Start listening; returns the :class:`asyncio.Server`."""
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        self._executor.shutdown()
+
+
+def serve(host="127.0.0.1", port=8765, **options):
+    """Run a :class:`RenderService` on ``host:port`` until interrupted."""
+    service = RenderService(**options)
+
+    async def main():
+        server = await service.start(host, port)
+        log.info("listening on %s:%d with %d workers", host, port, service.workers)
+        async with server:
+            await server.serve_forever()
+
+    service.warm_up()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+def render_remote(audio, fs, url="http://127.0.0.1:8765", timeout=600, **params):
+    """Render ``audio`` on a running service; ``params`` become query parameters.
+
+    Returns ``(output, fs)``, e.g. ``render_remote(x, 44100, circuit="overdrive")``.
+    """
+
+    body = io.BytesIO()
+    sf.write(body, audio, fs, subtype="FLOAT", format="WAV")
+    request = urllib.request.Request(
+        f"{url}/render?{urllib.parse.urlencode(params)}",
+        data=body.getvalue(),
+        headers={"Content-Type": "audio/wav"},
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return sf.read(io.BytesIO(response.read()), dtype="float32")
@@ -1,13 +1,15 @@
 import numpy as np
 import soundfile as sf
-import matplotlib.pyplot as plt
 from PySpice.Unit import *
 from PySpice.Logging.Logging import setup_logging
+import hashlib
+import logging
 import os
+import tempfile
+from fractions import Fraction
 from scipy import signal
-import librosa
 
-from .generate import generate_riff
+from .profiling import count, stage
 from .dsp import normalize, low_pass
 from .circuits import (
     fuzz_circuit,
@@ -17,69 +19,498 @@ from .circuits import (
 )
 
 setup_logging()
+log = logging.getLogger(__name__)
 
+# Audio bandwidth (Hz) each quality keeps when choosing the internal
+# simulation rate; ``None`` simulates at the input rate.
+QUALITY_BANDWIDTH = {"draft": 4000, "balanced": 8000, "reference": None}
+DEFAULT_QUALITY = "balanced"
 
-def simulate_circuit(circuit, input_wave, fs, target_fs=8000):
-    """Run a transient simulation of ``circuit`` using ``input_wave``.
+# ngspice transient options for each quality.  ``max_step`` is in sample
+# periods of the internal rate; ``balanced`` is ngspice's defaults.
+SOLVER_PROFILES = {
+    "draft": {"method": "trap", "reltol": 1e-2, "abstol": 1e-10, "vntol": 1e-5, "max_step": 2.0},
+    "balanced": {"method": "trap", "reltol": 1e-3, "abstol": 1e-12, "vntol": 1e-6, "max_step": 1.0},
+    "reference": {"method": "gear", "reltol": 1e-4, "abstol": 1e-13, "vntol": 1e-7, "max_step": 0.5},
+}
+# Settings tried in turn when a transient fails to converge ("timestep too
+# small", "singular matrix"): damped Gear integration with looser
+# tolerances and more iterations, then a conductance across every junction
+# and from every node to ground.
+RECOVERY_PROFILES = [
+    {"method": "gear", "reltol": 1e-2, "abstol": 1e-10, "vntol": 1e-5, "itl4": 100, "max_step": 1.0},
+    {
+        "method": "gear",
+        "reltol": 1e-2,
+        "abstol": 1e-9,
+        "vntol": 1e-4,
+        "itl4": 500,
+        "gmin": 1e-10,
+        "rshunt": 1e12,
+        "max_step": 0.5,
+    },
+]
+
+
+# Total circuit nodes :func:`simulate_batch` aims for in one netlist.
+BATCH_NODES = 256
+
+
+# ngspice messages of a transient aborted because it doesn't converge.
+CONVERGENCE_FAILURES = ("timestep too small", "singular matrix")
+
+
+class NonConvergence(Exception):
+    """A transient stopped with one of :data:`CONVERGENCE_FAILURES`."""
 
-    The previous implementation ignored ``input_wave`` and drove the circuit
-    with a sinusoidal voltage source.  We now feed the actual audio samples by
-    creating a piece-wise linear voltage source that follows the waveform.
 
-    To keep the number of points manageable (which speeds up
-    ``PieceWiseLinearVoltageSource`` creation), ``input_wave`` can be resampled
-    to ``target_fs`` if the original ``fs`` is higher.  Resampling uses
-    ``librosa`` when available and falls back to ``scipy.signal`` otherwise.
+class ConvergenceError(RuntimeError):
+    """ngspice failed to converge with every profile in :data:`RECOVERY_PROFILES`."""
+
+
+def _write_stimulus(path, times, input_wave, block=65536):
+    """Write ``time value`` rows for an XSPICE ``filesource``.
+
+    Rows are formatted a block at a time with a single ``%`` operation, which
+    is several times faster than :func:`numpy.savetxt` and keeps the
+    temporary string size bounded.
     """
 
-    orig_len = len(input_wave)
-    print("Length of input wave:", orig_len)
-    print("Sampling rate:", fs)
-    orig_fs = fs
-    if target_fs and fs > target_fs:
-        input_wave = librosa.resample(
-            np.asarray(input_wave), orig_sr=fs, target_sr=target_fs
-        )
-        print("Resampled input wave length:", len(input_wave))
-        fs = target_fs
-
-    step = 1 / fs @ u_s
-
-    # Create (time, value) pairs for the voltage source.
-    times = np.arange(len(input_wave)) / fs
-    values = [(t @ u_s, float(v) @ u_V) for t, v in zip(times, input_wave)]
+    rows = np.column_stack([times, input_wave])
+    with open(path, "w") as f:
+        for start in range(0, len(rows), block):
+            chunk = rows[start : start + block]
+            f.write(("%.12g %.9g\n" * len(chunk)) % tuple(chunk.ravel().tolist()))
+
+
+def _detach_input(circuit):
+    """Remove the input source added by :func:`_attach_input`, if any."""
+    if "Ainput" in circuit.element_names:
+        circuit.element("Ainput").detach()
+    # PySpice has no public way to remove a model.
+    circuit._models.pop("stimulus", None)
+
 
-    print("Creating PieceWiseLinearVoltageSource with", len(values), "points")
+def circuit_hash(circuit):
+    """Hex digest identifying the netlist of ``circuit`` (without its input)."""
+    _detach_input(circuit)
+    return hashlib.sha256(str(circuit).encode()).hexdigest()
 
-    circuit.PieceWiseLinearVoltageSource(
-        "input", "in", circuit.gnd, values=values, dc=float(input_wave[0]) @ u_V
+
+def _attach_input(circuit, path, times, input_wave, suffix=""):
+    """Drive the ``in`` node of ``circuit`` with ``input_wave``.
+
+    The samples are written straight from NumPy to ``path`` and played back
+    by an XSPICE ``filesource``, which interpolates linearly between points
+    just like a PWL source.  This avoids building two PySpice unit objects per
+    sample and keeps the netlist a few lines long regardless of clip length.
+
+    Any input source left over from a previous run is removed first so the
+    same circuit object can be simulated repeatedly.  ``suffix`` is appended
+    to the node, source and model names, to drive one of several inputs.
+    """
+
+    _detach_input(circuit)
+    _write_stimulus(path, times, input_wave)
+
+    circuit.A(f"input{suffix}", f"%vd([in{suffix} 0])", model=f"stimulus{suffix}")
+    circuit.model(
+        f"stimulus{suffix}",
+        "filesource",
+        file=f'"{path}"',
+        amploffset="[0]",
+        amplscale="[1]",
+        timerelative="false",
+        amplstep="false",
     )
 
-    simulator = circuit.simulator(temperature=25, nominal_temperature=25)
-    analysis = simulator.transient(step_time=step, end_time=len(input_wave) / fs @ u_s)
-    out = np.array(analysis.out)
 
-    print("Simulation complete, output length:", len(out))
+def solver_profile(profile=DEFAULT_QUALITY):
+    """The :data:`SOLVER_PROFILES` entry for ``profile``.
+
+    ``profile`` may be a profile dict, a quality name or anything else
+    accepted as ``target_fs`` (a rate in Hz or ``None``), which uses the
+    default quality's profile.
+    """
+
+    if isinstance(profile, dict):
+        return profile
+    return SOLVER_PROFILES[profile if profile in SOLVER_PROFILES else DEFAULT_QUALITY]
+
+
+def solver_options(profile):
+    """The ngspice ``.options`` of ``profile`` (everything but ``max_step``)."""
+    return {key: value for key, value in profile.items() if key != "max_step"}
+
+
+def raise_failure(ngspice, error):
+    """Re-raise ``error`` from a failed ngspice command, marking convergence failures.
+
+    If the output of the failed command (``ngspice`` is the
+    :class:`~PySpice.Spice.NgSpice.Shared.NgSpiceShared` that ran it)
+    contains one of :data:`CONVERGENCE_FAILURES` a
+    :class:`NonConvergence` is raised instead, which :func:`with_recovery`
+    retries.
+    """
+
+    output = f"{getattr(ngspice, 'stdout', '')}\n{getattr(ngspice, 'stderr', '')}".lower()
+    for message in CONVERGENCE_FAILURES:
+        if message in output:
+            raise NonConvergence(message) from error
+    raise error
+
+
+def with_recovery(run, profile, label="transient"):
+    """Call ``run(profile)``, retrying with :data:`RECOVERY_PROFILES` if it fails.
+
+    ``run`` signals a transient that didn't converge by raising
+    :class:`NonConvergence` (see :func:`raise_failure`); any other error
+    propagates at once.  Every retry is logged and counted as
+    ``convergence_retries``.  Raises :class:`ConvergenceError` if the last
+    recovery profile fails too.
+    """
+
+    for attempt, settings in enumerate([profile] + RECOVERY_PROFILES):
+        try:
+            return run(settings)
+        except NonConvergence as error:
+            if attempt == len(RECOVERY_PROFILES):
+                raise ConvergenceError(f"{label} did not converge: {error}") from error
+            log.warning("%s did not converge (%s); retrying with relaxed settings", label, error)
+            count("convergence_retries")
+
+
+def _run_transient(circuit, n, fs, profile, initial_state=None):
+    """Run the transient of ``n`` samples at ``fs`` for ``circuit`` with its inputs attached."""
+
+    def run(settings):
+        simulator = circuit.simulator(temperature=25, nominal_temperature=25)
+        # Report the solution interpolated onto multiples of the step
+        # instead of at ngspice's own adaptive timepoints.
+        simulator.options("interp", **solver_options(settings))
+        if initial_state:
+            simulator.initial_condition(**initial_state)
+        try:
+            return simulator.transient(
+                step_time=1 / fs @ u_s,
+                end_time=n / fs @ u_s,
+                max_time=settings["max_step"] / fs @ u_s,
+                use_initial_condition=bool(initial_state),
+            )
+        except NameError as error:
+            # PySpice reports failed ngspice commands as NameErrors.
+            raise_failure(getattr(simulator, "ngspice", None), error)
+
+    with stage("simulate.transient", samples=n):
+        analysis = with_recovery(run, solver_profile(profile), circuit.title)
+    count("ngspice_timesteps", len(analysis.time))
+    return analysis
+
+
+def _transient(circuit, input_wave, fs, initial_state=None, profile=DEFAULT_QUALITY):
+    """Run one transient over ``input_wave`` and return ``(analysis, state)``.
+
+    ``analysis`` is the PySpice transient result and ``state`` maps every node
+    name to its voltage at the last sample of ``input_wave``.  Passing that mapping back in
+    as ``initial_state`` starts the next run from exactly where this one
+    stopped (capacitor charges are implied by the node voltages) instead of
+    solving a fresh DC operating point.
+
+    ``profile`` selects the solver settings (see :func:`solver_profile`); if
+    the run fails to converge it is repeated with :func:`with_recovery`.
+    """
+
+    times = np.arange(len(input_wave)) / fs
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with stage("simulate.stimulus", samples=len(input_wave)):
+            _attach_input(circuit, os.path.join(tmp, "stimulus.txt"), times, input_wave)
+        analysis = _run_transient(circuit, len(input_wave), fs, profile, initial_state)
+
+    # The last stimulus sample is at (n - 1) / fs; the run goes on to n / fs,
+    # past the end of the input, so the state is taken on the grid.
+    n = len(input_wave)
+    state = {
+        name: float(_on_grid(analysis.time, node, n, fs)[-1])
+        for name, node in analysis.nodes.items()
+    }
+    return analysis, state
+
+
+def batch_size(circuit):
+    """How many copies of ``circuit`` :func:`simulate_batch` puts in one netlist.
+
+    Every copy adds its nodes to the matrix solved at each timestep, and
+    all copies share the timesteps of the most demanding clip, so batches
+    are capped at about :data:`BATCH_NODES` nodes in total.
+    """
+
+    _detach_input(circuit)
+    nodes = sum(1 for name in circuit.node_names if name != str(circuit.gnd))
+    return max(1, BATCH_NODES // max(1, nodes))
+
+
+def batch_circuit(circuit, copies):
+    """A circuit holding ``copies`` instances of ``circuit``.
+
+    ``circuit`` becomes the subcircuit ``pedal`` with pins ``in`` and
+    ``out``; instance ``i`` is wired to the nodes ``in{i}`` and ``out{i}``.
+    Models stay global so the instances share them.
+    """
+
+    from PySpice.Spice.Netlist import Circuit, SubCircuit
+
+    from .linear import _copy_element
 
-    # Resample back to the original sampling rate if it was changed during
-    # simulation.  Ngspice can also return a variable number of samples so we
-    # resample again to match the original input length.  ``signal.resample`` is
-    # used here because it operates purely on the sample count regardless of the
-    # current sampling rate.
-    if fs != orig_fs:
-        out = librosa.resample(out, orig_sr=fs, target_sr=orig_fs)
-        fs = orig_fs
+    _detach_input(circuit)
+    pedal = SubCircuit("pedal", "in", "out")
+    for element in circuit.elements:
+        _copy_element(element, pedal)
 
-    if len(out) != orig_len:
-        out = signal.resample(out, orig_len)
+    batch = Circuit(f"{circuit.title}Batch")
+    for model in circuit.models:
+        batch.model(model._name, model._model_type, **model._parameters)
+    batch.subcircuit(pedal)
+    for i in range(copies):
+        batch.X(i, "pedal", f"in{i}", f"out{i}")
+    return batch
 
-    print("Output length:", len(out))
-    print("Output sampling rate:", fs)
+
+def _simulate_batch(circuit, waves, fs, profile):
+    """Simulate equally long ``waves`` in one transient; returns one output per wave."""
+    batch = batch_circuit(circuit, len(waves))
+    n = len(waves[0])
+    times = np.arange(n) / fs
+    with tempfile.TemporaryDirectory() as tmp:
+        with stage("simulate.stimulus", samples=n * len(waves)):
+            for i, wave in enumerate(waves):
+                _attach_input(batch, os.path.join(tmp, f"stimulus{i}.txt"), times, wave, suffix=i)
+        analysis = _run_transient(batch, n, fs, profile)
+    return [_on_grid(analysis.time, analysis.nodes[f"out{i}"], n, fs) for i in range(len(waves))]
+
+
+def simulate_batch(circuit, inputs, fs, target_fs=DEFAULT_QUALITY, profile=None, size=None):
+    """Simulate every clip in ``inputs`` through ``circuit``; returns a list of outputs.
+
+    For short clips starting ngspice and parsing the netlist costs far more
+    than the transient itself.  Here up to ``size`` clips (default:
+    :func:`batch_size`) are simulated together, as instances of the circuit
+    in one netlist (see :func:`batch_circuit`), each driven by its own
+    input, so that cost is paid once per batch.  Clips are grouped by
+    length and shorter ones padded with their last sample.  ``target_fs``
+    and ``profile`` are as in :func:`simulate_circuit` and every output has
+    the length of its clip.
+    """
+
+    inputs = [np.asarray(x, dtype=float) for x in inputs]
+    profile = solver_profile(target_fs if profile is None else profile)
+    size = size or batch_size(circuit)
+    up, down = _rate_ratio(fs, target_fs)
+    rate = fs * up / down
+
+    outputs = [np.zeros(0) for _ in inputs]
+    order = sorted((i for i, x in enumerate(inputs) if len(x)), key=lambda i: len(inputs[i]))
+    for start in range(0, len(order), size):
+        group = order[start : start + size]
+        with stage("simulate.resample_in", samples=sum(len(inputs[i]) for i in group)):
+            waves = [_resample(inputs[i], up, down) for i in group]
+        lengths = [len(wave) for wave in waves]
+        n = max(lengths)
+        waves = [np.pad(wave, (0, n - len(wave)), mode="edge") for wave in waves]
+        count("simulated_samples", n * len(waves))
+        count("batched_clips", len(waves))
+        log.debug("Simulating %d clips of %d samples at %s Hz in one netlist", len(waves), n, rate)
+
+        outs = _simulate_batch(circuit, waves, rate, profile)
+        for i, out, length in zip(group, outs, lengths):
+            with stage("simulate.resample_back", samples=length):
+                outputs[i] = _resample(out[:length], down, up)[: len(inputs[i])]
+    return outputs
+
+
+def _on_grid(time, out, n, fs):
+    """The first ``n`` samples of ``out`` on the grid ``arange(n) / fs``.
+
+    With ``.options interp`` ngspice already reports exactly those points
+    (plus the end point), so this is normally a slice.  Interpolation is
+    only needed if the simulator ignored the option.
+    """
+
+    time = np.asarray(time, dtype=float)
+    out = np.asarray(out, dtype=float)
+    if n and len(out) in (n, n + 1) and abs(time[n - 1] * fs - (n - 1)) < 1e-3:
+        return out[:n]
+    log.debug("ngspice returned %d points off the %d sample grid", len(out), n)
+    return np.interp(np.arange(n) / fs, time, out)
+
+
+def internal_rate(fs, target_fs=DEFAULT_QUALITY):
+    """The rate at which audio at ``fs`` is simulated.
+
+    ``target_fs`` is either a rate in Hz (used if lower than ``fs``),
+    ``None`` for ``fs`` itself, or a quality name from
+    :data:`QUALITY_BANDWIDTH`.  A quality simulates at twice its bandwidth
+    (never above ``fs``); the rational ratio to ``fs`` is handled by the
+    polyphase resampler.
+    """
+
+    if isinstance(target_fs, str):
+        bandwidth = QUALITY_BANDWIDTH[target_fs]
+        if bandwidth is None:
+            return fs
+        return min(fs, 2 * bandwidth)
+    if not target_fs or fs <= target_fs:
+        return fs
+    return target_fs
+
+
+def _rate_ratio(fs, target_fs):
+    """``(up, down)`` taking ``fs`` to ``internal_rate(fs, target_fs)``."""
+    ratio = Fraction(internal_rate(fs, target_fs) / fs).limit_denominator(1000)
+    return ratio.numerator, ratio.denominator
+
+
+def _resample(x, up, down):
+    if up == down:
+        return np.asarray(x, dtype=float)
+    return signal.resample_poly(x, up, down)
+
+
+def run_resampled(simulate, input_wave, fs, target_fs=DEFAULT_QUALITY):
+    """Run ``simulate(wave, rate)`` at the internal rate and return output at ``fs``.
+
+    The internal rate comes from :func:`internal_rate`.  ``input_wave`` is
+    resampled to it with a polyphase filter, ``simulate`` must return one
+    output sample per input sample, and the output is brought back to
+    ``fs`` and exactly ``len(input_wave)`` samples.
+    This is shared by :func:`simulate_circuit` and the warm simulators in
+    :mod:`guitarpedals.pool`.
+    """
+
+    orig_len = len(input_wave)
+    up, down = _rate_ratio(fs, target_fs)
+    rate = fs * up / down
+    log.debug("Simulating %d samples at %s Hz (internal rate %s Hz)", orig_len, fs, rate)
+
+    with stage("simulate.resample_in", samples=orig_len):
+        wave = _resample(input_wave, up, down)
+
+    count("simulated_samples", len(wave))
+    out = simulate(wave, rate)
+
+    with stage("simulate.resample_back", samples=len(out)):
+        out = _resample(out, down, up)[:orig_len]
 
     return out
 
 
+def simulate_circuit(circuit, input_wave, fs, target_fs=DEFAULT_QUALITY, profile=None):
+    """Run a transient simulation of ``circuit`` using ``input_wave``.
+
+    The previous implementation ignored ``input_wave`` and drove the circuit
+    with a sinusoidal voltage source.  We now feed the actual audio samples
+    through a file-backed source that follows the waveform (see
+    :func:`_attach_input`), so building the netlist is cheap even at full
+    44.1/48 kHz.
+
+    The circuit is simulated at a lower internal rate chosen by
+    ``target_fs`` (a rate in Hz, a quality name such as ``"draft"`` or
+    ``"reference"``, or ``None`` for ``fs``; see :func:`internal_rate`),
+    which reduces the number of transient timesteps.  The result always has
+    exactly ``len(input_wave)`` samples at ``fs``.
+
+    ``profile`` picks the ngspice integration method, tolerances and
+    maximum step from :data:`SOLVER_PROFILES`; by default the one named by
+    ``target_fs``, or ``balanced`` for a rate.  Runs that fail to converge
+    are retried with relaxed settings (see :func:`with_recovery`).
+
+    A list of clips is simulated with :func:`simulate_batch`, several clips
+    per ngspice run, and a list of outputs returned.  The channels of a
+    multichannel ``(n, channels)`` input are batched the same way;
+    :func:`~guitarpedals.parallel.simulate_channels` runs them in separate
+    processes instead.
+    """
+
+    if isinstance(input_wave, (list, tuple)):
+        return simulate_batch(circuit, input_wave, fs, target_fs, profile)
+    input_wave = np.asarray(input_wave)
+    if input_wave.ndim > 1:
+        return np.stack(simulate_batch(circuit, input_wave.T, fs, target_fs, profile), axis=1)
+    profile = solver_profile(target_fs if profile is None else profile)
+
+    def run(wave, rate):
+        analysis, _ = _transient(circuit, wave, rate, profile=profile)
+        return _on_grid(analysis.time, analysis.out, len(wave), rate)
+
+    return run_resampled(run, input_wave, fs, target_fs)
+
+
+def _iter_segments(input_wave, size):
+    """Yield ``input_wave`` in chunks of ``size`` samples.
+
+    ``input_wave`` may be an array or any iterable of sample blocks (for
+    example a file being read block by block); blocks are re-cut so every
+    segment except the last has exactly ``size`` samples.
+    """
+
+    if isinstance(input_wave, np.ndarray):
+        for start in range(0, len(input_wave), size):
+            yield input_wave[start : start + size]
+        return
+
+    pending = np.empty(0)
+    for block in input_wave:
+        pending = np.concatenate([pending, np.asarray(block, dtype=float)])
+        while len(pending) >= size:
+            yield pending[:size]
+            pending = pending[size:]
+    if len(pending):
+        yield pending
+
+
+def simulate_stream(circuit, input_wave, fs, segment_seconds=1.0, profile=DEFAULT_QUALITY):
+    """Simulate ``circuit`` segment by segment, yielding output as it goes.
+
+    ``input_wave`` is cut into segments of ``segment_seconds`` and each one is
+    run as its own short transient, so netlist size and simulator memory stay
+    constant no matter how long the input is.  Every segment starts from the
+    node voltages the previous one ended with, and its stimulus begins at the
+    previous segment's last sample, so the joins are seamless.  A segment
+    that fails to converge is retried on its own with relaxed solver
+    settings; ``profile`` is as in :func:`simulate_circuit`.
+
+    Unlike :func:`simulate_circuit` no resampling is done here; the circuit is
+    simulated at ``fs`` and each yielded block has the same length as the
+    segment it was computed from.
+    """
+
+    size = max(1, int(round(segment_seconds * fs)))
+    state = None
+    last = None
+
+    for segment in _iter_segments(input_wave, size):
+        segment = np.asarray(segment, dtype=float)
+        if last is None:
+            # The first segment solves for the DC operating point as usual.
+            wave = segment
+        else:
+            wave = np.concatenate([[last], segment])
+
+        analysis, state = _transient(circuit, wave, fs, initial_state=state, profile=profile)
+
+        out = _on_grid(analysis.time, analysis.out, len(wave), fs)
+        if last is not None:
+            out = out[1:]
+
+        last = segment[-1]
+        yield out
+
+
 def main(outdir="outputs"):
+    import matplotlib.pyplot as plt
+
+    from .generate import generate_riff
+
     os.makedirs(outdir, exist_ok=True)
     audio, fs = generate_riff(os.path.join(outdir, "riff.wav"))
     audio = normalize(audio)
@@ -0,0 +1,216 @@
+import os
+import tempfile
+
+import numpy as np
+import soundfile as sf
+
+from .cache import DEFAULT_CACHE_DIR
+from .dsp import LowPass, resample_blocks
+from .profiling import stage
+from .simulate import DEFAULT_QUALITY, _rate_ratio
+
+# Frames per block read from or written to disk.
+DEFAULT_BLOCK = 65536
+
+
+def read_blocks(path, block_size=DEFAULT_BLOCK, dtype="float32"):
+    """Yield the samples of the audio file ``path`` ``block_size`` frames at a time."""
+    with sf.SoundFile(path) as f:
+        for block in f.blocks(block_size, dtype=dtype):
+            yield block
+
+
+def write_blocks(path, blocks, fs, channels=1, subtype=None):
+    """Write an iterable of sample blocks to ``path``; returns the frame count."""
+    frames = 0
+    with sf.SoundFile(path, "w", fs, channels, subtype) as f:
+        for block in blocks:
+            with stage("io.write", samples=len(block)):
+                f.write(block)
+            frames += len(block)
+    return frames
+
+
+def spool(blocks, out):
+    """Copy ``blocks`` into ``out``, e.g. a column of a memory-mapped ``.npy``.
+
+    Samples beyond ``len(out)`` are dropped (the iterable is still consumed)
+    and missing ones are left untouched.
+    """
+
+    position = 0
+    for block in blocks:
+        n = min(len(block), len(out) - position)
+        out[position : position + n] = block[:n]
+        position += n
+    return out
+
+
+def stream_engine(
+    engine,
+    circuit,
+    blocks,
+    fs,
+    target_fs=DEFAULT_QUALITY,
+    segment_seconds=1.0,
+    peak=1.0,
+    cache_dir=DEFAULT_CACHE_DIR,
+):
+    """Yield the output of ``circuit`` for an iterable of input ``blocks``.
+
+    The block-by-block counterpart of the engines behind the ``simulate``
+    command.  ``spice`` resamples to the internal rate chosen by
+    ``target_fs`` and runs :func:`~guitarpedals.simulate.simulate_stream`,
+    ``native`` uses a :class:`~guitarpedals.native.NativeStream`, ``lut``
+    needs the input ``peak`` up front to pick its table and ``split``
+    streams the nonlinear front of the circuit through ngspice and filters
+    its output with the fitted linear section
+    (see :func:`~guitarpedals.linear.simulate_split`).  The output may run
+    a few samples past the input; callers trim it.
+    """
+
+    if engine == "native":
+        from .native import NativeStream
+
+        simulator = NativeStream(circuit, fs)
+        for block in blocks:
+            yield simulator.process(block)
+        return
+
+    if engine == "lut":
+        from .lut import _span, cached_transfer_curve
+
+        vin, vout = cached_transfer_curve(circuit, _span(peak), cache_dir=cache_dir)
+        for block in blocks:
+            with stage("lut.interpolate", samples=len(block)):
+                yield np.interp(block, vin, vout)
+        return
+
+    from .simulate import simulate_stream
+
+    fit = None
+    if engine == "split":
+        from .linear import section_blocks, section_sos, split_front
+
+        circuit, fit = split_front(circuit, cache_dir)
+
+    up, down = _rate_ratio(fs, target_fs)
+    wave = resample_blocks(blocks, up, down)
+    out = simulate_stream(circuit, wave, fs * up / down, segment_seconds, target_fs)
+    out = resample_blocks(out, down, up)
+    if fit is not None:
+        out = section_blocks(section_sos(fit, fs), out)
+    yield from out
+
+
+def _with_tail(convolver, blocks):
+    for block in blocks:
+        yield convolver.process(block)
+    yield convolver.flush()
+
+
+def _channel_blocks(path, channel, block_size):
+    for block in read_blocks(path, block_size):
+        yield block if block.ndim == 1 else block[:, channel]
+
+
+def simulate_file(
+    input_path,
+    output_path,
+    circuit,
+    engine="spice",
+    factor=1,
+    target_fs=DEFAULT_QUALITY,
+    segment_seconds=1.0,
+    block_size=DEFAULT_BLOCK,
+    cache_dir=DEFAULT_CACHE_DIR,
+    subtype=None,
+    reverb_ir=None,
+    ir_cache_dir=DEFAULT_CACHE_DIR,
+):
+    """Render ``input_path`` through ``circuit`` into ``output_path`` in blocks.
+
+    Applies the same chain as the ``simulate`` command (oversampling,
+    simulation, downsampling, low-pass and normalization) but never holds
+    more than a block of audio in memory.  Samples stay float32; the output
+    before normalization is spooled to a memory-mapped ``.npy`` file so the
+    peak is known before the output file is written.  Multichannel files are
+    processed one channel per pass over the input, each into its own column.
+
+    With ``reverb_ir`` the output also goes through a streaming
+    :class:`~guitarpedals.reverb.PartitionedConvolver` (its spectra cached
+    in ``ir_cache_dir`` by :func:`~guitarpedals.reverb.cached_ir`, or not
+    at all if it is ``None``) and keeps the reverb tail; a
+    multichannel IR turns a mono input into one output channel per IR
+    channel.  Returns the sample rate of the output.
+    """
+
+    info = sf.info(input_path)
+    fs, frames, channels = info.samplerate, info.frames, info.channels
+
+    length, ir_channels = frames, 1
+    if reverb_ir:
+        from .reverb import PartitionedConvolver, cached_ir
+
+        reverb = cached_ir(reverb_ir, fs, cache_dir=ir_cache_dir)
+        ir_channels = reverb.spectra.shape[2]
+        if channels != ir_channels and 1 not in (channels, ir_channels):
+            raise ValueError(f"{channels}-channel input with a {ir_channels}-channel IR")
+        length += reverb.ir_length - 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Simulated (dry) output, one column per input channel.
+        dry = np.lib.format.open_memmap(
+            os.path.join(tmp, "dry.npy"), mode="w+", dtype=np.float32, shape=(frames, channels)
+        )
+        for channel in range(channels):
+            peak = 1.0
+            if engine == "lut":
+                peak = max(
+                    (
+                        float(np.max(np.abs(block)))
+                        for block in _channel_blocks(input_path, channel, block_size)
+                    ),
+                    default=0.0,
+                )
+
+            blocks = _channel_blocks(input_path, channel, block_size)
+            blocks = resample_blocks(blocks, factor, 1)
+            blocks = stream_engine(
+                engine, circuit, blocks, fs * factor, target_fs, segment_seconds, peak, cache_dir
+            )
+            spool(resample_blocks(blocks, 1, factor), dry[:, channel])
+
+        # Reverb and low-pass, one column per output channel.
+        y = np.lib.format.open_memmap(
+            os.path.join(tmp, "output.npy"),
+            mode="w+",
+            dtype=np.float32,
+            shape=(length, max(channels, ir_channels)),
+        )
+        for column in range(y.shape[1]):
+            source = dry[:, column if channels > 1 else 0]
+            blocks = (source[start : start + block_size] for start in range(0, frames, block_size))
+            if reverb_ir:
+                convolver = PartitionedConvolver(
+                    reverb.spectra[:, :, column if ir_channels > 1 else 0, np.newaxis],
+                    reverb.ir_length,
+                )
+                blocks = _with_tail(convolver, blocks)
+            low_pass = LowPass(fs)
+            spool((low_pass.process(block) for block in blocks), y[:, column])
+        y.flush()
+
+        peak = 0.0
+        for start in range(0, length, block_size):
+            peak = max(peak, float(np.max(np.abs(y[start : start + block_size]))))
+        scale = np.float32(1 / peak if peak else 1)
+        write_blocks(
+            output_path,
+            (y[start : start + block_size] * scale for start in range(0, length, block_size)),
+            fs,
+            y.shape[1],
+            subtype,
+        )
+        del dry, y
+    return fs
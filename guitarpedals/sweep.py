@@ -0,0 +1,138 @@
+import csv
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .circuits import KNOBS, build_circuit
+from .simulate import DEFAULT_QUALITY
+
+# SPICE-style scale suffixes accepted by :func:`parse_value`.
+SI_PREFIXES = {"meg": 1e6, "f": 1e-15, "p": 1e-12, "n": 1e-9, "u": 1e-6, "m": 1e-3, "k": 1e3, "g": 1e9}
+FEATURES = ("rms", "crest", "thd")
+
+
+def parse_value(text):
+    """Parse a component value such as ``"47k"``, ``"2.2u"`` or ``"1meg"``."""
+    text = text.strip().lower()
+    for suffix, scale in SI_PREFIXES.items():
+        if text.endswith(suffix):
+            return float(text[: -len(suffix)]) * scale
+    return float(text)
+
+
+def knob_grid(ranges):
+    """Every combination of the knob values in ``ranges`` (knob -> list of values).
+
+    The last knob varies fastest, so neighbouring settings usually differ in
+    a single component value.
+    """
+    names = list(ranges)
+    return [dict(zip(names, values)) for values in itertools.product(*ranges.values())]
+
+
+def test_tone(fs=44100, seconds=0.5, frequency=220.0, amplitude=0.5):
+    """A sine wave to measure the circuits with."""
+    t = np.arange(int(fs * seconds)) / fs
+    return amplitude * np.sin(2 * np.pi * frequency * t)
+
+
+def thd(y, harmonics=10):
+    """Total harmonic distortion of ``y`` relative to its strongest component.
+
+    Power is summed over a few bins around the fundamental and each
+    harmonic of a Hann-windowed spectrum.
+    """
+
+    y = np.asarray(y, dtype=float)
+    spectrum = np.abs(np.fft.rfft((y - y.mean()) * np.hanning(len(y)))) ** 2
+    fundamental = int(np.argmax(spectrum[1:])) + 1
+
+    def power(k):
+        return spectrum[max(k - 2, 0) : k + 3].sum()
+
+    distortion = sum(
+        power(h * fundamental) for h in range(2, harmonics + 1) if h * fundamental < len(spectrum)
+    )
+    base = power(fundamental)
+    return float(np.sqrt(distortion / base)) if base else 0.0
+
+
+def audio_features(y):
+    """RMS level, crest factor (peak / RMS) and THD of ``y``, DC removed."""
+    y = np.asarray(y, dtype=float)
+    y = y - y.mean()
+    rms = float(np.sqrt(np.mean(y**2)))
+    crest = float(np.max(np.abs(y)) / rms) if rms else 0.0
+    return {"rms": rms, "crest": crest, "thd": thd(y)}
+
+
+def _run_settings(name, settings, audio, fs, engine, target_fs):
+    """Simulate ``settings`` one after the other in this process."""
+    rows = []
+    for knobs in settings:
+        circuit = build_circuit(name, **knobs)
+        if engine == "native":
+            from .native import simulate_native
+
+            y = simulate_native(circuit, audio, fs)
+        else:
+            from .pool import external_netlist, warm_simulator
+
+            # Only the knob values differ from the previous setting, so the
+            # loaded circuit is updated with ``alter`` rather than reparsed.
+            y = warm_simulator().run(external_netlist(circuit), audio, fs, target_fs)
+        rows.append({**knobs, **audio_features(y)})
+    return rows
+
+
+def run_sweep(name, grid, audio, fs, jobs=None, engine="spice", target_fs=DEFAULT_QUALITY):
+    """Simulate circuit ``name`` for every knob setting in ``grid``.
+
+    ``grid`` is a list of knob dicts (see :func:`knob_grid`).  It is cut into
+    ``jobs`` contiguous chunks (default: CPU count), each simulated by one
+    worker process whose warm ngspice instance keeps the circuit loaded and
+    only alters component values between settings; ``engine="native"`` uses
+    the built-in solver instead.  Returns one row per setting with the knob
+    values and :func:`audio_features` of the output.
+    """
+
+    for knobs in grid:
+        unknown = set(knobs) - set(KNOBS[name])
+        if unknown:
+            raise ValueError(f"{name} has no knob '{unknown.pop()}'")
+    audio = np.asarray(audio)
+    jobs = max(1, min(jobs or os.cpu_count(), len(grid)))
+    if jobs == 1:
+        return _run_settings(name, grid, audio, fs, engine, target_fs)
+
+    bounds = np.linspace(0, len(grid), jobs + 1).astype(int)
+    with ProcessPoolExecutor(
+        max_workers=jobs, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futures = [
+            executor.submit(_run_settings, name, grid[a:b], audio, fs, engine, target_fs)
+            for a, b in zip(bounds[:-1], bounds[1:])
+        ]
+        return [row for future in futures for row in future.result()]
+
+
+def format_table(rows):
+    """The sweep ``rows`` as an aligned text table."""
+    if not rows:
+        return ""
+    columns = list(rows[0])
+    lines = ["".join(f"{column:>12}" for column in columns)]
+    for row in rows:
+        lines.append("".join(f"{row[column]:>12.4g}" for column in columns))
+    return "\n".join(lines)
+
+
+def write_table(rows, path):
+    """Write the sweep ``rows`` to the CSV file ``path``."""
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else list(FEATURES))
+        writer.writeheader()
+        writer.writerows(rows)